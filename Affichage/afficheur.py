@@ -5,6 +5,7 @@ from PyQt5.QtGui import QTextCursor
 from Affichage.Trajectoire import TrajectoryWidget
 from Utils.constants import APP_BG, TITLE_BG, TITLE_FG, PANEL_BG, GRID_BORDER, ZONE_NAMES, MOUSE_IMAGE_PATH
 from Affichage.widgets import GridTile
+from Affichage.occupation import OccupationPanel
 from Domaine.controle_donnee import ControleDonnee
 from Utils.qtlogger import setup_logger
 
@@ -32,6 +33,9 @@ class Afficheur(QtWidgets.QMainWindow):
         self._controle.data_updated.connect(self.on_update)
         self._controle.ids_catalog_updated.connect(self.on_ids_catalog_updated)
         self._controle.current_count_updated.connect(self.on_current_count)
+        self._history_pending = None  # souris dont l'historique est en cours de lecture
+        if hasattr(self._controle, "history_ready"):
+            self._controle.history_ready.connect(self.on_history_ready)
 
         # Logger
         self.logger, self.log_emitter = setup_logger("app")
@@ -78,7 +82,13 @@ class Afficheur(QtWidgets.QMainWindow):
                 t.title.setStyleSheet("font-weight:700; font-size:16px;")
                 t.ids.setStyleSheet("font-size:16px;")
 
-        center.addWidget(grid_wrap, 1)
+        # Grille et statistiques d'occupation en onglets
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.addTab(grid_wrap, "Grille")
+        self.occupation = OccupationPanel(self._controle)
+        self._controle.ids_catalog_updated.connect(self.occupation.on_ids_catalog_updated)
+        self.tabs.addTab(self.occupation, "Occupation")
+        center.addWidget(self.tabs, 1)
 
         # Panneau droit
         side = QtWidgets.QFrame(); side.setObjectName("side")
@@ -156,6 +166,9 @@ class Afficheur(QtWidgets.QMainWindow):
         row.addWidget(self.btn_show_hist)
         hl.addLayout(row)
         self.btn_export_csv = self._mk_button("Exporter tout (CSV)"); self.btn_export_csv.clicked.connect(self.on_export_csv); hl.addWidget(self.btn_export_csv)
+        self.btn_export_visits = self._mk_button("Exporter les visites (CSV)"); self.btn_export_visits.clicked.connect(self.on_export_visits); hl.addWidget(self.btn_export_visits)
+        self.btn_export_visits.setEnabled(controle.supports_visits() if hasattr(controle, "supports_visits") else False)
+        self.btn_export_contacts = self._mk_button("Exporter les contacts (CSV)"); self.btn_export_contacts.clicked.connect(self.on_export_contacts); hl.addWidget(self.btn_export_contacts)
         self.btn_clear_hist = self._mk_button("Vider l'historique"); self.btn_clear_hist.clicked.connect(self.on_clear_history); hl.addWidget(self.btn_clear_hist)
         side_lay.addWidget(hist_box)
 
@@ -187,6 +200,7 @@ class Afficheur(QtWidgets.QMainWindow):
             if initial_ids:
                 for mid in initial_ids:
                     self.cb_mouse.addItem(mid)
+                self.occupation.on_ids_catalog_updated(initial_ids)
         except Exception:
             pass
 
@@ -259,6 +273,26 @@ class Afficheur(QtWidgets.QMainWindow):
         except Exception as e:
             QtWidgets.QMessageBox.warning(self, "Export", f"Erreur: {e}")
 
+    @QtCore.pyqtSlot()
+    def on_export_visits(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Exporter les visites", "visites.csv", "CSV (*.csv)")
+        if not path: return
+        try:
+            self._controle.export_visits_csv(path)
+            QtWidgets.QMessageBox.information(self, "Export", f"Export OK: {path}")
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Export", f"Erreur: {e}")
+
+    @QtCore.pyqtSlot()
+    def on_export_contacts(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Exporter les contacts", "contacts.csv", "CSV (*.csv)")
+        if not path: return
+        try:
+            self._controle.export_contacts_csv(path)
+            QtWidgets.QMessageBox.information(self, "Export", f"Export OK: {path}")
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Export", f"Erreur: {e}")
+
     @QtCore.pyqtSlot()
     def on_clear_history(self):
         confirm = QtWidgets.QMessageBox.question(self, "Vider l'historique", "Effacer tous les fichiers de logs ?", QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
@@ -302,12 +336,27 @@ class Afficheur(QtWidgets.QMainWindow):
         mid = self.cb_mouse.currentText().strip()
         if not mid:
             QtWidgets.QMessageBox.information(self, "Historique", "Choisis une souris dans la liste."); return
+        if hasattr(self._controle, "request_history"):
+            # lecture dans le thread du worker : le dialogue s'ouvre à la réception (on_history_ready)
+            self._history_pending = mid
+            self.btn_show_hist.setEnabled(False)
+            self._controle.request_history(mid)
+            return
         events = self._controle.get_history(mid)
-        self._show_history_dialog(mid, events)
+        visits = self._controle.get_visits(mid) if hasattr(self._controle, "get_visits") else []
+        self._show_history_dialog(mid, events, visits)
+
+    def on_history_ready(self, mouse_id: str, events: list, visits: list):
+        if mouse_id != self._history_pending:
+            return
+        self._history_pending = None
+        self.btn_show_hist.setEnabled(True)
+        self._show_history_dialog(mouse_id, events, visits)
 
-    def _show_history_dialog(self, mouse_id, events):
+    def _show_history_dialog(self, mouse_id, events, visits=()):
         dlg = QtWidgets.QDialog(self); dlg.setWindowTitle(f"Historique – {mouse_id}")
         h = QtWidgets.QHBoxLayout(dlg)
+        tabs = QtWidgets.QTabWidget(dlg)
 
         table = QtWidgets.QTableWidget(len(events), 3, dlg)
         table.setHorizontalHeaderLabels(["Heure", "Zone", "Événement"])
@@ -317,7 +366,20 @@ class Afficheur(QtWidgets.QMainWindow):
             table.setItem(r, 1, QtWidgets.QTableWidgetItem(str(ev.zone_idx + 1)))
             table.setItem(r, 2, QtWidgets.QTableWidgetItem(EVENT_LABELS_FR.get(ev.event, ev.event)))
         table.resizeColumnsToContents()
-        h.addWidget(table, 1)
+        tabs.addTab(table, f"Événements ({len(events)})")
+
+        # Visites : enter/stay/leave compactés (une ligne par passage dans une zone)
+        vtable = QtWidgets.QTableWidget(len(visits), 4, dlg)
+        vtable.setHorizontalHeaderLabels(["Entrée", "Sortie", "Zone", "Lectures"])
+        vtable.horizontalHeader().setStretchLastSection(True)
+        for r, v in enumerate(visits):
+            vtable.setItem(r, 0, QtWidgets.QTableWidgetItem(v.enter_ts.strftime("%Y-%m-%d %H:%M:%S")))
+            vtable.setItem(r, 1, QtWidgets.QTableWidgetItem(v.leave_ts.strftime("%H:%M:%S") if v.leave_ts else "en cours"))
+            vtable.setItem(r, 2, QtWidgets.QTableWidgetItem(str(v.zone_idx + 1)))
+            vtable.setItem(r, 3, QtWidgets.QTableWidgetItem(str(v.reads)))
+        vtable.resizeColumnsToContents()
+        tabs.addTab(vtable, f"Visites ({len(visits)})")
+        h.addWidget(tabs, 1)
 
         view = TrajectoryWidget(); view.set_events(events); view.setMinimumSize(420, 360)
         h.addWidget(view, 1)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from PyQt5 import QtCore, QtWidgets
+
+from Utils.constants import ZONE_NAMES
+
+
+def _fmt_duration(ms: int) -> str:
+    s = int(ms // 1000)
+    h, s = divmod(s, 3600)
+    m, s = divmod(s, 60)
+    return f"{h:d}:{m:02d}:{s:02d}"
+
+
+class OccupationPanel(QtWidgets.QWidget):
+    """Temps passé, visites et transitions par zone pour une souris (agrégats de ControleDonnee)."""
+
+    REFRESH_MS = 2000
+
+    def __init__(self, controle, parent=None):
+        super().__init__(parent)
+        self._controle = controle
+        lay = QtWidgets.QVBoxLayout(self); lay.setContentsMargins(6, 6, 6, 6)
+
+        row = QtWidgets.QHBoxLayout()
+        self.cb_mouse = QtWidgets.QComboBox(); self.cb_mouse.setPlaceholderText("Sélectionner une souris…")
+        self.cb_mouse.currentTextChanged.connect(self.refresh)
+        row.addWidget(self.cb_mouse, 1)
+        self.btn_rebuild = QtWidgets.QPushButton("Recalculer depuis les logs")
+        self.btn_rebuild.clicked.connect(self.on_rebuild)
+        row.addWidget(self.btn_rebuild)
+        lay.addLayout(row)
+
+        split = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+        self.tbl_zones = QtWidgets.QTableWidget(len(ZONE_NAMES), 2)
+        self.tbl_zones.setHorizontalHeaderLabels(["Visites", "Temps passé"])
+        self.tbl_zones.setVerticalHeaderLabels(ZONE_NAMES)
+        self.tbl_zones.horizontalHeader().setStretchLastSection(True)
+        self.tbl_zones.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        split.addWidget(self.tbl_zones)
+
+        short = [str(i + 1) for i in range(len(ZONE_NAMES))]
+        self.tbl_trans = QtWidgets.QTableWidget(len(ZONE_NAMES), len(ZONE_NAMES))
+        self.tbl_trans.setHorizontalHeaderLabels(short)   # colonne = zone d'arrivée
+        self.tbl_trans.setVerticalHeaderLabels(short)     # ligne = zone de départ
+        self.tbl_trans.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.tbl_trans.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        self.tbl_trans.setToolTip("Transitions : ligne = zone quittée, colonne = zone entrée")
+        split.addWidget(self.tbl_trans)
+        lay.addWidget(split, 1)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start()
+
+    @QtCore.pyqtSlot(list)
+    def on_ids_catalog_updated(self, ids_list):
+        current = {self.cb_mouse.itemText(i) for i in range(self.cb_mouse.count())}
+        for mid in ids_list:
+            if mid not in current: self.cb_mouse.addItem(mid)
+
+    @QtCore.pyqtSlot()
+    def on_rebuild(self):
+        try:
+            self._controle.rebuild_occupancy()
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Occupation", f"Erreur: {e}")
+
+    @QtCore.pyqtSlot()
+    def refresh(self):
+        if not self.isVisible():
+            return
+        mid = self.cb_mouse.currentText().strip()
+        stats = self._controle.get_occupancy(mid) if mid else None
+        n = len(ZONE_NAMES)
+        for z in range(n):
+            visits = stats["visits"][z] if stats else 0
+            dwell = stats["dwell_ms"][z] if stats else 0
+            self.tbl_zones.setItem(z, 0, QtWidgets.QTableWidgetItem(str(visits)))
+            self.tbl_zones.setItem(z, 1, QtWidgets.QTableWidgetItem(_fmt_duration(dwell)))
+            for k in range(n):
+                v = stats["transitions"][z][k] if stats else 0
+                self.tbl_trans.setItem(z, k, QtWidgets.QTableWidgetItem(str(v) if v else ""))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Point de reprise de l'état de présence (souris -> zone, dernier événement émis) dans un petit JSON.
+
+Écriture atomique (fichier temporaire + os.replace) ; le coût ne dépend que du nombre de souris
+présentes, jamais de la taille de l'historique. Au démarrage, l'état relu est réconcilié avec
+la première trame : seuls les vrais changements (sorties, déplacements, nouvelles souris) sont journalisés.
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+APP_LOGGER_NAME = "app"
+_VERSION = 1
+
+
+class PresenceCheckpoint:
+    def __init__(self, path: str, stale_after_s: float = 300.0, logger=None):
+        self.path = path
+        self.stale_after_s = float(stale_after_s)
+        self.logger = logger or logging.getLogger(APP_LOGGER_NAME)
+        self.writes = 0
+
+    def save(self, presence: Dict[str, int], last: Dict[str, int], now_ms: Optional[int] = None):
+        data = {"version": _VERSION, "saved_ms": int(time.time() * 1000) if now_ms is None else now_ms,
+                "presence": presence, "last": last}
+        tmp = self.path + ".tmp"
+        try:
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path)
+            self.writes += 1
+        except OSError as e:
+            self.logger.error(f"Écriture du point de reprise impossible ({self.path}): {e}")
+
+    def load(self) -> Optional[dict]:
+        """{"saved_ms", "presence", "last", "stale"} ou None si absent / illisible."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != _VERSION:
+                return None
+            presence = {str(k): int(v) for k, v in data.get("presence", {}).items()}
+            last = {str(k): int(v) for k, v in data.get("last", {}).items()}
+            saved_ms = int(data["saved_ms"])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Point de reprise ignoré ({self.path}): {e}")
+            return None
+        stale = time.time() * 1000 - saved_ms > self.stale_after_s * 1000
+        return {"saved_ms": saved_ms, "presence": presence, "last": last, "stale": stale}
+
+    def remove(self):
+        try: os.remove(self.path)
+        except OSError: pass
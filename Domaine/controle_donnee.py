@@ -1,95 +1,170 @@
 # -*- coding: utf-8 -*-
 from PyQt5 import QtCore
-from Pilotes.stm32controle import STM32Controle
-from Stockage.history_csv import HistoryStoreCSV
+from Pilotes.stm32controle import STM32Controle, FRAME_TS_KEY
+from Stockage.history_csv import HistoryStoreCSV, EV_LEAVE
+from Domaine.presence import PresenceTable
+from Domaine.filtre_rebond import FiltreRebond
+from Domaine.occupation import OccupancyStats
+from Domaine.copresence import CoPresenceTracker
+from Domaine.checkpoint import PresenceCheckpoint
+import logging
+import os
+import sys
+import time
 from datetime import datetime
-from Utils.constants import resolve_idtag, antenne_to_zone
+from Utils.constants import resolve_idtag, antenne_to_zone, DEBOUNCE_MISS_CYCLES, DEBOUNCE_CONFIRM_READS
 
-class ControleDonnee(QtCore.QObject):
-    data_updated = QtCore.pyqtSignal(dict)
+
+class _DomainWorker(QtCore.QObject):
+    """
+    Traitement des flushs du pilote : normalisation, anti-rebond, diff de présence, écriture historique.
+    Vit dans le thread GUI (mode historique) ou dans son propre QThread (threaded=True) ;
+    seuls des instantanés compacts repartent vers l'UI.
+    """
+    snapshot = QtCore.pyqtSignal(dict, int)         # {zone: [ids]}, nb de souris présentes
     ids_catalog_updated = QtCore.pyqtSignal(list)
-    current_count_updated = QtCore.pyqtSignal(int)
+    history_loaded = QtCore.pyqtSignal(str, list, list)  # mouse_id, événements, visites
 
-    def __init__(self, stm32controle: STM32Controle, store=None, parent=None):
-        super().__init__(parent)
-        self._stm = stm32controle
-        self._stm.updated.connect(self._on_raw_update)
-        self._history = store or HistoryStoreCSV("logs")
-        self._last_presence = {}
-        self._last_event = {}
+    def __init__(self, history, debounce: FiltreRebond, checkpoint: PresenceCheckpoint = None,
+                 checkpoint_interval_s: float = 5.0):
+        super().__init__()
+        self._history = history
+        self._filter = debounce
+        self._checkpoint = checkpoint
+        self._ckpt_interval_ms = int(checkpoint_interval_s * 1000)
+        self._ckpt_timer = None
+        self._ckpt_dirty = False
+        self._restored = None  # point de reprise relu, réconcilié avec la première trame
+        self._presence = PresenceTable()  # état souris x zone, slots denses
+        self.stats = OccupancyStats()      # temps par zone / transitions / visites, lu depuis le thread GUI
+        self.contacts = CoPresenceTracker()  # paires de souris dans une même zone
         self._known_ids = set()
 
+    @QtCore.pyqtSlot()
+    def preload(self):
         try:
             pre_ids = set(self._history.preload_ids_from_disk())
-            if pre_ids:
-                self._known_ids |= pre_ids
-                self.ids_catalog_updated.emit(sorted(self._known_ids))
         except Exception:
-            pass
+            return
+        if pre_ids - self._known_ids:
+            self._known_ids |= pre_ids
+            self.ids_catalog_updated.emit(sorted(self._known_ids))
 
-    def start(self): self._stm.start()
-    def stop(self): self._stm.stop()
-    def reset(self):
-        self._stm.reset()
-        self._last_presence.clear()
-        self._last_event.clear()
+    @QtCore.pyqtSlot()
+    def flush(self, release: bool = False):
+        if hasattr(self._history, "flush"):
+            try: self._history.flush(release=release)
+            except Exception: pass
 
-    def set_num_mice(self, n: int): pass
+    @QtCore.pyqtSlot()
+    def flush_release(self):
+        self.flush(release=True)
 
-    # === NOUVEAU : expose le bridge série (si backend réel) ===
-    def get_serial_bridge(self):
-        try:
-            from Pilotes.stm32controle_serial import STM32ControleSerial
-        except Exception:
-            STM32ControleSerial = None
-        try:
-            if STM32ControleSerial and isinstance(self._stm, STM32ControleSerial) and hasattr(self._stm, "get_bridge"):
-                return self._stm.get_bridge()
-        except Exception:
-            pass
-        return None
+    # --- Point de reprise (écriture différée sur minuterie, hors du chemin des trames) ---
+    @QtCore.pyqtSlot()
+    def start_checkpoint(self):
+        if self._checkpoint is None:
+            return
+        saved = self._checkpoint.load()
+        if saved and saved["presence"]:
+            self._presence.restore(saved["presence"], saved["last"])
+            if not saved["stale"]:
+                self._filter.seed(saved["presence"])
+            self._restored = saved
+            logging.getLogger("app").info(
+                f"Point de reprise restauré : {len(saved['presence'])} souris présentes"
+                f"{' (ancien)' if saved['stale'] else ''}.")
+        if self._ckpt_interval_ms > 0:
+            self._ckpt_timer = QtCore.QTimer(self)  # créé dans le thread du worker
+            self._ckpt_timer.setInterval(self._ckpt_interval_ms)
+            self._ckpt_timer.timeout.connect(self._write_checkpoint)
+            self._ckpt_timer.start()
 
+    @QtCore.pyqtSlot()
+    def _write_checkpoint(self):
+        if self._ckpt_dirty:
+            self.save_checkpoint()
 
-    def get_mouse_ids(self):
-        ids = set(self._history.get_mouse_ids())
-        try:
-            ids.update(self._history.preload_ids_from_disk())
-        except Exception:
-            pass
-        return sorted(ids)
+    @QtCore.pyqtSlot()
+    def save_checkpoint(self):
+        if self._checkpoint is None:
+            return
+        presence, last = self._presence.state()  # O(souris présentes)
+        self._checkpoint.save(presence, last)
+        self._ckpt_dirty = False
 
-    def get_history(self, mouse_id: str): return self._history.get_history(mouse_id)
-    def export_history_csv(self, path: str, mouse_ids=None): self._history.export_csv(path, mouse_ids)
+    @QtCore.pyqtSlot()
+    def close(self):
+        if self._ckpt_timer is not None:
+            self._ckpt_timer.stop()
+        self.save_checkpoint()
+        self.flush()
+        if hasattr(self._history, "close"):
+            try: self._history.close()
+            except Exception: pass
 
-    def clear_history(self):
-        import os, glob
-        for f in glob.glob("logs/*.csv"):
-            try: os.remove(f)
-            except: pass
-        if hasattr(self._history, "_mem"): self._history._mem.clear()
-        self._last_presence.clear()
-        self._last_event.clear()
+    @QtCore.pyqtSlot()
+    def reset(self):
+        self._presence.clear()
+        self._filter.clear()
+        self._ckpt_dirty = True
+
+    @QtCore.pyqtSlot()
+    def clear(self):
+        if hasattr(self._history, "clear"): self._history.clear()
+        self.reset()
+        self.stats.clear()
+        self.contacts.clear()
         self._known_ids.clear()
+        if self._checkpoint is not None:
+            self._checkpoint.remove()
+        self._ckpt_dirty = False
 
-    def configure_serial(self, port: str, baudrate: int):
+    @QtCore.pyqtSlot()
+    def rebuild_occupancy(self):
+        """Recalcule les agrégats d'occupation depuis les fichiers jour du store."""
+        self.flush()
         try:
-            from Pilotes.stm32controle_serial import STM32ControleSerial
-        except Exception:
-            STM32ControleSerial = None
-        if STM32ControleSerial and isinstance(self._stm, STM32ControleSerial):
-            running = getattr(self._stm, "_thread", None) is not None
-            if running:
-                self._stm.stop()
-            self._stm.configure(port=port, baudrate=baudrate)
+            self.stats = OccupancyStats.rebuild_from_logs(self._history.dir)
+        except Exception as e:
+            logging.getLogger("app").error(f"Recalcul des statistiques d'occupation impossible : {e}")
+
+    @QtCore.pyqtSlot()
+    def rebuild_contacts(self):
+        """Recalcule la co-présence depuis les fichiers jour du store."""
+        self.flush()
+        try:
+            self.contacts = CoPresenceTracker.rebuild_from_logs(self._history.dir)
+        except Exception as e:
+            logging.getLogger("app").error(f"Recalcul de la co-présence impossible : {e}")
+
+    @QtCore.pyqtSlot(str)
+    def load_history(self, mouse_id: str):
+        """Historique et visites d'une souris, lus dans le thread du worker puis rendus par history_loaded."""
+        events, visits = [], []
+        try:
+            events = self._history.get_history(mouse_id)
+            if hasattr(self._history, "get_visits"):
+                visits = self._history.get_visits(mouse_id)
+        except Exception as e:
+            logging.getLogger("app").error(f"Lecture de l'historique de {mouse_id} impossible : {e}")
+        self.history_loaded.emit(mouse_id, events, visits)
+
+    def set_filter(self, debounce: FiltreRebond):
+        self._filter = debounce
 
     @QtCore.pyqtSlot(dict)
-    def _on_raw_update(self, mapping: dict):
-        now = datetime.now()
+    def process(self, mapping: dict):
+        # epoch ms de réception série si le pilote le fournit ; datetime reconstruit seulement à l'affichage/export
+        now = mapping.get(FRAME_TS_KEY) if isinstance(mapping, dict) else None
+        if not isinstance(now, int):
+            now = int(time.time() * 1000)
         normalized = {}
+        intern = sys.intern
 
         def add(zone_idx: int, raw_idtag: str):
             zone = antenne_to_zone(zone_idx)
-            name = resolve_idtag(raw_idtag)
+            name = intern(resolve_idtag(raw_idtag))
             normalized.setdefault(zone, []).append(name)
 
         if isinstance(mapping, dict):
@@ -116,32 +191,257 @@ class ControleDonnee(QtCore.QObject):
             for n in names:
                 current_presence[n] = zone_idx
 
-        for mid, z in current_presence.items():
-            if mid not in self._last_presence:
-                self._history.add_event(mid, z, "enter", now)
-                self._last_event[mid] = ("enter", z)
+        # Anti-rebond : lectures manquées / changements de zone non confirmés retenus
+        filtered = self._filter.apply(current_presence)
+        if filtered != current_presence:
+            current_presence = filtered
+            normalized = {}
+            for n, zone_idx in filtered.items():
+                normalized.setdefault(zone_idx, []).append(n)
+
+        # Tous les changements du flush en un seul appel au store
+        changes = self._presence.diff(current_presence)
+        events = [(mid, z, code, now) for mid, z, code in changes]
+        if self._restored is not None:
+            # 1re trame après reprise : une souris disparue pendant un long arrêt sort à l'heure du point de reprise,
+            # mais jamais avant minuit du jour courant (un jour passé peut déjà être archivé)
+            if self._restored["stale"]:
+                day0 = datetime.fromtimestamp(now / 1000.0).replace(hour=0, minute=0, second=0, microsecond=0)
+                saved_ms = min(max(self._restored["saved_ms"], int(day0.timestamp() * 1000)), now)
+                events = [(mid, z, code, saved_ms if code == EV_LEAVE and mid not in current_presence else ts)
+                          for mid, z, code, ts in events]
+            self._restored = None
+        if events:
+            if hasattr(self._history, "add_events"):
+                self._history.add_events(events)
             else:
-                prev_z = self._last_presence[mid]
-                if prev_z == z:
-                    if self._last_event.get(mid) != ("stay", z):
-                        self._history.add_event(mid, z, "stay", now)
-                        self._last_event[mid] = ("stay", z)
-                else:
-                    self._history.add_event(mid, prev_z, "leave", now)
-                    self._history.add_event(mid, z, "enter", now)
-                    self._last_event[mid] = ("enter", z)
-
-        for mid, prev_z in self._last_presence.items():
-            if mid not in current_presence:
-                self._history.add_event(mid, prev_z, "leave", now)
-                self._last_event[mid] = ("leave", prev_z)
-
-        self._last_presence = current_presence
+                for ev in events:
+                    self._history.add_event(*ev)
+            self.stats.feed_batch(events)
+            self._ckpt_dirty = True
 
-        self.data_updated.emit(normalized)
-        self.current_count_updated.emit(len(current_presence))
+        self.contacts.update(normalized, now)
+
+        self.snapshot.emit(normalized, len(current_presence))
 
         added = set(current_presence.keys()) - self._known_ids
         if added:
             self._known_ids |= added
             self.ids_catalog_updated.emit(sorted(self._known_ids))
+
+
+class ControleDonnee(QtCore.QObject):
+    data_updated = QtCore.pyqtSignal(dict)
+    ids_catalog_updated = QtCore.pyqtSignal(list)
+    current_count_updated = QtCore.pyqtSignal(int)
+    history_ready = QtCore.pyqtSignal(str, list, list)  # réponse à request_history : mouse_id, événements, visites
+
+    def __init__(self, stm32controle: STM32Controle, store=None, parent=None, debounce: FiltreRebond = None,
+                 threaded: bool = False, checkpoint_path: str = None, checkpoint_interval_s: float = 5.0):
+        super().__init__(parent)
+        self._stm = stm32controle
+        self._history = store or HistoryStoreCSV("logs")
+        self._filter = debounce or FiltreRebond(DEBOUNCE_MISS_CYCLES, DEBOUNCE_CONFIRM_READS)
+        self._known_ids = set()
+
+        # threaded=True : traitement et écritures dans un QThread dédié, l'UI ne reçoit que les instantanés
+        # Point de reprise de la présence : par défaut <dossier du store>/.presence.json ("" = désactivé)
+        if checkpoint_path is None:
+            checkpoint_path = os.path.join(self._history.dir, ".presence.json")
+        checkpoint = PresenceCheckpoint(checkpoint_path) if checkpoint_path else None
+        self._worker = _DomainWorker(self._history, self._filter, checkpoint, checkpoint_interval_s)
+        self._thread = None
+        if threaded:
+            self._thread = QtCore.QThread()
+            self._thread.setObjectName("ControleDonnee")
+            self._worker.moveToThread(self._thread)
+            self._thread.start()
+        self._stm.updated.connect(self._worker.process)
+        self._worker.snapshot.connect(self._on_snapshot)
+        self._worker.ids_catalog_updated.connect(self._on_ids_catalog)
+        self._worker.history_loaded.connect(self.history_ready)
+
+        # Reprise avant toute trame, puis catalogue disque (arrive par ids_catalog_updated)
+        self._invoke("start_checkpoint", blocking=False)
+        self._invoke("preload", blocking=False)
+
+    def _invoke(self, slot: str, blocking: bool = True):
+        """Appelle un slot du worker dans son thread (direct si pas de thread dédié)."""
+        if self._thread is None:
+            getattr(self._worker, slot)()
+            return
+        conn = QtCore.Qt.BlockingQueuedConnection if blocking else QtCore.Qt.QueuedConnection
+        QtCore.QMetaObject.invokeMethod(self._worker, slot, conn)
+
+    @QtCore.pyqtSlot(dict, int)
+    def _on_snapshot(self, normalized: dict, count: int):
+        self.data_updated.emit(normalized)
+        self.current_count_updated.emit(count)
+
+    @QtCore.pyqtSlot(list)
+    def _on_ids_catalog(self, ids: list):
+        self._known_ids |= set(ids)
+        self.ids_catalog_updated.emit(ids)
+
+    def start(self): self._stm.start()
+    def stop(self):
+        self._stm.stop()
+        self._flush_history()
+        if self._thread is None or self._thread.isRunning():
+            self._invoke("save_checkpoint")  # un STOP/START ne rejoue pas d'entrées
+
+    def close(self):
+        """Arrêt définitif (fermeture appli) : vide et ferme l'écrivain d'historique."""
+        if self._thread is None:
+            self._worker.close()
+            return
+        if not self._thread.isRunning():
+            return
+        self._invoke("close")
+        self._thread.quit()
+        self._thread.wait()
+
+    def _flush_history(self, release: bool = False):
+        if self._thread is not None and not self._thread.isRunning():
+            return
+        self._invoke("flush_release" if release else "flush")
+
+    def reset(self):
+        self._stm.reset()
+        self._invoke("reset")
+
+    def set_num_mice(self, n: int): pass
+
+    # === NOUVEAU : expose le bridge série (si backend réel) ===
+    def get_serial_bridge(self):
+        try:
+            from Pilotes.stm32controle_serial import STM32ControleSerial
+        except Exception:
+            STM32ControleSerial = None
+        try:
+            if STM32ControleSerial and isinstance(self._stm, STM32ControleSerial) and hasattr(self._stm, "get_bridge"):
+                return self._stm.get_bridge()
+        except Exception:
+            pass
+        return None
+
+
+    def get_mouse_ids(self):
+        # _known_ids contient déjà le préchargement disque : pas de second parcours des logs
+        ids = set(self._known_ids)
+        ids.update(self._history.get_mouse_ids())
+        if not ids and self._thread is None:  # en mode threadé, le catalogue arrive par signal
+            try:
+                ids.update(self._history.preload_ids_from_disk())
+            except Exception:
+                pass
+        return sorted(ids)
+
+    def request_history(self, mouse_id: str):
+        """Lecture asynchrone (thread du worker) de l'historique et des visites ; réponse par history_ready."""
+        if self._thread is None:
+            self._worker.load_history(mouse_id)
+            return
+        QtCore.QMetaObject.invokeMethod(self._worker, "load_history", QtCore.Qt.QueuedConnection,
+                                        QtCore.Q_ARG(str, mouse_id))
+
+    def get_history(self, mouse_id: str, start=None, end=None):
+        if start is None and end is None:
+            return self._history.get_history(mouse_id)
+        return self._history.get_history(mouse_id, start, end)
+
+    def query_history(self, start=None, end=None, mouse_ids=None, zones=None, events=None):
+        """Evénements d'une plage horaire (itérateur paresseux) si le store le permet."""
+        if hasattr(self._history, "query"):
+            return self._history.query(start, end, mouse_ids, zones, events)
+        return iter(())
+
+    def occupancy_at(self, at):
+        """Répartition {zone: [ids]} de la cage à l'instant at (datetime) si le store a un index de présences."""
+        if hasattr(self._history, "occupancy_at"):
+            return self._history.occupancy_at(at)
+        return {}
+
+    def who_was_in(self, zone_idx: int, at):
+        if hasattr(self._history, "who_was_in"):
+            return self._history.who_was_in(zone_idx, at)
+        return []
+
+    def set_debounce(self, miss_cycles: int, confirm_reads: int):
+        self._filter = FiltreRebond(miss_cycles, confirm_reads)
+        self._worker.set_filter(self._filter)  # simple affectation d'attribut, sûre entre threads
+
+    def get_filter_stats(self):
+        """Compteurs du filtre anti-rebond (sorties / changements de zone retenus)."""
+        return self._filter.stats()
+
+    def get_occupancy(self, mouse_id: str, live: bool = True):
+        """Temps passé par zone (ms), visites et matrice de transitions de la souris (None si inconnue)."""
+        return self._worker.stats.summary(mouse_id, int(time.time() * 1000) if live else None)
+
+    def supports_rebuild(self) -> bool:
+        """True si le store écrit des fichiers jour CSV, seule source des recalculs batch (HistoryStoreCSV)."""
+        return isinstance(self._history, HistoryStoreCSV)
+
+    def _require_day_files(self, what: str):
+        if not self.supports_rebuild():
+            raise RuntimeError(f"{what} : {type(self._history).__name__} n'écrit pas de fichiers jour CSV")
+
+    def rebuild_occupancy(self):
+        """Recalcul batch depuis logs/ (dans le thread du worker s'il en a un)."""
+        self._require_day_files("Recalcul de l'occupation")
+        self._invoke("rebuild_occupancy", blocking=False)
+
+    def get_contacts(self, live: bool = True):
+        """Durées de co-présence {(a, b): ms}, épisodes en cours inclus si live."""
+        return self._worker.contacts.durations(int(time.time() * 1000) if live else None)
+
+    def get_contact_episodes(self, since_ms: int = None):
+        return self._worker.contacts.episodes(since_ms)
+
+    def export_contacts_csv(self, path: str):
+        self._worker.contacts.export_matrix_csv(path, int(time.time() * 1000))
+
+    def rebuild_contacts(self):
+        self._require_day_files("Recalcul de la co-présence")
+        self._invoke("rebuild_contacts", blocking=False)
+
+    def get_cache_stats(self):
+        return self._history.cache_stats() if hasattr(self._history, "cache_stats") else {}
+
+    def export_history_csv(self, path: str, mouse_ids=None): self._history.export_csv(path, mouse_ids)
+
+    def get_visits(self, mouse_id: str = None, start=None, end=None):
+        """Historique compacté en visites (entrée, sortie, zone, lectures) si le store le permet."""
+        if hasattr(self._history, "get_visits"):
+            return self._history.get_visits(mouse_id, start, end)
+        return []
+
+    def supports_visits(self) -> bool:
+        """True si le store d'historique sait compacter et exporter les visites (HistoryStoreCSV)."""
+        return hasattr(self._history, "get_visits") and hasattr(self._history, "export_visits_csv")
+
+    def export_visits_csv(self, path: str, mouse_ids=None):
+        if not self.supports_visits():
+            raise RuntimeError(f"{type(self._history).__name__} ne gère pas les visites")
+        self._history.export_visits_csv(path, mouse_ids)
+
+    def clear_history(self):
+        import os, glob
+        self._flush_history(release=True)
+        for f in glob.glob("logs/*.csv") + glob.glob("logs/*.csv.gz"):
+            try: os.remove(f)
+            except: pass
+        self._invoke("clear")
+        self._known_ids.clear()
+
+    def configure_serial(self, port: str, baudrate: int):
+        try:
+            from Pilotes.stm32controle_serial import STM32ControleSerial
+        except Exception:
+            STM32ControleSerial = None
+        if STM32ControleSerial and isinstance(self._stm, STM32ControleSerial):
+            running = getattr(self._stm, "_thread", None) is not None
+            if running:
+                self._stm.stop()
+            self._stm.configure(port=port, baudrate=baudrate)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Co-présence (contacts sociaux) : paires de souris partageant une zone, et pendant combien de temps.
+
+update() reçoit la répartition {zone: [ids]} de chaque flush (celle que ControleDonnee construit déjà) :
+coût O(k²) par zone occupée (k = souris dans la zone, quelques unités) + O(paires actives).
+Matrice creuse : (a, b) -> durée cumulée en ms, a < b. Un épisode = une paire continûment
+ensemble dans la même zone ; il se termine quand la paire se sépare ou change de zone.
+Au rejeu, un silence de plus de SESSION_GAP_MS termine tous les épisodes (fin de session).
+"""
+import csv, os
+import threading
+import time
+from collections import deque
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Stockage.archive import list_day_files
+from Stockage.compaction import SESSION_GAP_MS, iter_raw_events
+
+Pair = Tuple[str, str]
+
+
+class ContactEpisode:
+    __slots__ = ("a", "b", "zone_idx", "start_ms", "end_ms")
+
+    def __init__(self, a: str, b: str, zone_idx: int, start_ms: int, end_ms: int):
+        self.a, self.b = a, b
+        self.zone_idx = zone_idx
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+
+    @property
+    def duration_ms(self) -> int:
+        return self.end_ms - self.start_ms
+
+    def __repr__(self):
+        return f"ContactEpisode({self.a!r}, {self.b!r}, zone={self.zone_idx}, {self.duration_ms} ms)"
+
+
+class CoPresenceTracker:
+    def __init__(self, max_episodes: int = 100_000):
+        self._active: Dict[Pair, Tuple[int, int]] = {}  # paire -> (zone, début ms)
+        self._total: Dict[Pair, int] = {}                # paire -> durée cumulée (épisodes terminés)
+        self._episodes = deque(maxlen=max_episodes)      # épisodes terminés, du plus ancien au plus récent
+        self._lock = threading.Lock()  # alimenté par le thread domaine, lu par le thread GUI
+
+    def update(self, normalized: Dict[int, Iterable[str]], ts_ms: int):
+        now_pairs: Dict[Pair, int] = {}
+        for zone, names in normalized.items():
+            if len(names) < 2:
+                continue
+            for pair in combinations(sorted(set(names)), 2):
+                now_pairs[pair] = zone
+        with self._lock:
+            active = self._active
+            for pair in [p for p, (z, _) in active.items() if now_pairs.get(p) != z]:
+                self._close(pair, ts_ms)
+            for pair, zone in now_pairs.items():
+                if pair not in active:
+                    active[pair] = (zone, ts_ms)
+
+    def _close(self, pair: Pair, ts_ms: int):
+        zone, start = self._active.pop(pair)
+        self._total[pair] = self._total.get(pair, 0) + (ts_ms - start)
+        self._episodes.append(ContactEpisode(pair[0], pair[1], zone, start, ts_ms))
+
+    def close_all(self, ts_ms: int):
+        with self._lock:
+            for pair in list(self._active):
+                self._close(pair, ts_ms)
+
+    def clear(self):
+        with self._lock:
+            self._active.clear()
+            self._total.clear()
+            self._episodes.clear()
+
+    # --- Requêtes ---
+    def durations(self, now_ms: Optional[int] = None) -> Dict[Pair, int]:
+        """Matrice creuse (a, b) -> ms ; now_ms ajoute les épisodes en cours."""
+        with self._lock:
+            out = dict(self._total)
+            if now_ms is not None:
+                for pair, (_, start) in self._active.items():
+                    out[pair] = out.get(pair, 0) + max(0, now_ms - start)
+        return out
+
+    def episodes(self, since_ms: Optional[int] = None) -> List[ContactEpisode]:
+        with self._lock:
+            return [e for e in self._episodes if since_ms is None or e.end_ms >= since_ms]
+
+    def active(self) -> Dict[Pair, Tuple[int, int]]:
+        with self._lock:
+            return dict(self._active)
+
+    def export_matrix_csv(self, path: str, now_ms: Optional[int] = None):
+        """Matrice carrée souris x souris des durées de contact (secondes), symétrique."""
+        dur = self.durations(now_ms)
+        ids = sorted({m for pair in dur for m in pair})
+        pos = {m: i for i, m in enumerate(ids)}
+        rows = [[0.0] * len(ids) for _ in ids]
+        for (a, b), ms in dur.items():
+            rows[pos[a]][pos[b]] = rows[pos[b]][pos[a]] = ms / 1000.0
+        with open(path, "w", newline="", encoding="utf-8-sig") as out:
+            w = csv.writer(out, delimiter=";")
+            w.writerow([""] + ids)
+            for m, row in zip(ids, rows):
+                w.writerow([m] + [f"{v:g}" for v in row])
+
+    # --- Mode batch ---
+    @classmethod
+    def rebuild_from_logs(cls, dirpath: str = "logs", max_episodes: int = 100_000,
+                          session_gap_ms: int = SESSION_GAP_MS, now_ms: Optional[int] = None) -> "CoPresenceTracker":
+        """
+        Rejoue les fichiers jour : présence reconstituée à chaque horodatage, puis update().
+        Chaque silence > session_gap_ms termine les épisodes et vide la présence ; les épisodes de la
+        dernière session restent en cours si elle date de moins de session_gap_ms avant now_ms.
+        """
+        tracker = cls(max_episodes)
+        present: Dict[str, int] = {}
+        zones: Dict[int, set] = {}
+        cur_ts = None
+        for fname in list_day_files(dirpath):
+            for mid, z, ev, ts in iter_raw_events(os.path.join(dirpath, fname)):
+                if ts != cur_ts:
+                    if cur_ts is not None:
+                        tracker.update(zones, cur_ts)
+                        if ts - cur_ts > session_gap_ms:
+                            tracker.close_all(cur_ts)
+                            present.clear()
+                            zones.clear()
+                    cur_ts = ts
+                old = present.get(mid)
+                if old is not None and (ev == "leave" or old != z):
+                    zones[old].discard(mid)
+                    del present[mid]
+                if ev != "leave" and mid not in present:
+                    present[mid] = z
+                    zones.setdefault(z, set()).add(mid)
+        if cur_ts is not None:
+            tracker.update(zones, cur_ts)
+            if (int(time.time() * 1000) if now_ms is None else now_ms) - cur_ts > session_gap_ms:
+                tracker.close_all(cur_ts)
+        return tracker
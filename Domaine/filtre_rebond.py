@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Filtre anti-rebond (hystérésis) entre STM32Controle.updated et le calcul des événements.
+
+- une souris absente d'un flush n'est sortie qu'après miss_cycles flushs consécutifs sans lecture ;
+- un changement de zone n'est accepté qu'après confirm_reads flushs consécutifs dans la nouvelle zone.
+Une première apparition est acceptée tout de suite. L'état ne porte que sur les tags actifs.
+miss_cycles=1 et confirm_reads=1 : filtre transparent.
+"""
+from typing import Dict
+
+
+class _TagState:
+    __slots__ = ("zone", "misses", "cand_zone", "cand_reads")
+
+    def __init__(self, zone: int):
+        self.zone = zone
+        self.misses = 0
+        self.cand_zone = zone
+        self.cand_reads = 0
+
+
+class FiltreRebond:
+    def __init__(self, miss_cycles: int = 1, confirm_reads: int = 1):
+        self.miss_cycles = max(1, int(miss_cycles))
+        self.confirm_reads = max(1, int(confirm_reads))
+        self._tags: Dict[str, _TagState] = {}
+        self.held_misses = 0   # flushs où une sortie a été retenue (tag manqué)
+        self.held_moves = 0    # flushs où un changement de zone a été retenu
+        self.passed_leaves = 0
+        self.passed_moves = 0
+
+    def apply(self, current: Dict[str, int]) -> Dict[str, int]:
+        """mouse_id -> zone lue sur ce flush  =>  mouse_id -> zone retenue."""
+        tags = self._tags
+        for mid, z in current.items():
+            st = tags.get(mid)
+            if st is None:
+                tags[mid] = _TagState(z)
+                continue
+            st.misses = 0
+            if z == st.zone:
+                st.cand_reads = 0
+                continue
+            if z == st.cand_zone:
+                st.cand_reads += 1
+            else:
+                st.cand_zone, st.cand_reads = z, 1
+            if st.cand_reads >= self.confirm_reads:
+                st.zone, st.cand_reads = z, 0
+                self.passed_moves += 1
+            else:
+                self.held_moves += 1
+        if len(tags) > len(current):
+            for mid in [m for m in tags if m not in current]:
+                st = tags[mid]
+                st.misses += 1
+                st.cand_reads = 0
+                if st.misses >= self.miss_cycles:
+                    del tags[mid]
+                    self.passed_leaves += 1
+                else:
+                    self.held_misses += 1
+        return {mid: st.zone for mid, st in tags.items()}
+
+    def seed(self, presence: Dict[str, int]):
+        """Reprise : les souris présentes au point de reprise bénéficient de l'hystérésis dès la 1re trame."""
+        for mid, z in presence.items():
+            self._tags[mid] = _TagState(z)
+
+    def clear(self):
+        self._tags.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_tags": len(self._tags),
+            "held_misses": self.held_misses,
+            "held_moves": self.held_moves,
+            "passed_leaves": self.passed_leaves,
+            "passed_moves": self.passed_moves,
+            "miss_cycles": self.miss_cycles,
+            "confirm_reads": self.confirm_reads,
+        }
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Statistiques d'occupation incrémentales, par souris :
+- temps passé par zone (ms, visites terminées) ;
+- matrice de transitions zone -> zone (entrées successives, diagonale = ré-entrée) ;
+- nombre de visites (entrées) par zone.
+feed() est O(1) par événement ; rebuild_from_logs() recalcule les mêmes agrégats depuis logs/ avec NumPy.
+
+Règles (identiques dans les deux modes) : une visite commence à un enter et se termine au leave
+suivant de la souris, ou à son enter suivant s'il manque un leave. Les stay ne changent rien.
+Au rejeu, le journal est découpé en sessions (silence > SESSION_GAP_MS) : une visite encore ouverte
+se termine au dernier événement de sa session, et les transitions ne franchissent pas une coupure.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from Stockage.archive import list_day_files
+from Stockage.compaction import SESSION_GAP_MS, iter_raw_events
+from Stockage.history_csv import EV_ENTER, EV_LEAVE, EVENT_CODES
+
+N_ZONES = 15
+
+
+class _MouseStats:
+    __slots__ = ("dwell", "visits", "trans", "zone", "since", "prev")
+
+    def __init__(self, n: int):
+        self.dwell = [0] * n
+        self.visits = [0] * n
+        self.trans = [0] * (n * n)  # ligne = zone quittée, colonne = zone entrée
+        self.zone = None            # visite ouverte
+        self.since = 0
+        self.prev = None            # zone de la dernière entrée
+
+
+class OccupancyStats:
+    def __init__(self, n_zones: int = N_ZONES):
+        self.n_zones = int(n_zones)
+        self._mice: Dict[str, _MouseStats] = {}
+        self._lock = threading.Lock()  # alimenté par le thread domaine, lu par le thread GUI
+
+    def feed(self, mouse_id: str, zone_idx: int, code: int, ts_ms: int):
+        if not (0 <= zone_idx < self.n_zones):
+            return
+        with self._lock:
+            self._feed(mouse_id, zone_idx, code, ts_ms)
+
+    def feed_batch(self, events, ts_ms: Optional[int] = None):
+        """[(mouse_id, zone_idx, code), ...] au même instant ts_ms, ou [(mouse_id, zone_idx, code, ts_ms), ...]."""
+        n = self.n_zones
+        with self._lock:
+            for ev in events:
+                if 0 <= ev[1] < n:
+                    self._feed(ev[0], ev[1], ev[2], ts_ms if ts_ms is not None else ev[3])
+
+    def _feed(self, mouse_id: str, z: int, code: int, ts_ms: int):
+        st = self._mice.get(mouse_id)
+        if st is None:
+            st = self._mice[mouse_id] = _MouseStats(self.n_zones)
+        if code == EV_ENTER:
+            if st.zone is not None:  # leave manquant : la visite se termine ici
+                st.dwell[st.zone] += ts_ms - st.since
+            if st.prev is not None:
+                st.trans[st.prev * self.n_zones + z] += 1
+            st.visits[z] += 1
+            st.zone, st.since, st.prev = z, ts_ms, z
+        elif code == EV_LEAVE and st.zone is not None:
+            st.dwell[st.zone] += ts_ms - st.since
+            st.zone = None
+
+    def clear(self):
+        with self._lock:
+            self._mice.clear()
+
+    # --- Requêtes ---
+    def mouse_ids(self) -> List[str]:
+        with self._lock:
+            return sorted(self._mice)
+
+    def summary(self, mouse_id: str, now_ms: Optional[int] = None) -> Optional[dict]:
+        """
+        {"dwell_ms": [..], "visits": [..], "transitions": [[..], ..], "zone": zone courante ou None}.
+        now_ms : ajoute la durée de la visite en cours au temps de sa zone.
+        """
+        n = self.n_zones
+        with self._lock:
+            st = self._mice.get(mouse_id)
+            if st is None:
+                return None
+            dwell = list(st.dwell)
+            if now_ms is not None and st.zone is not None:
+                dwell[st.zone] += max(0, now_ms - st.since)
+            return {
+                "dwell_ms": dwell,
+                "visits": list(st.visits),
+                "transitions": [st.trans[i * n:(i + 1) * n] for i in range(n)],
+                "zone": st.zone,
+            }
+
+    # --- Mode batch ---
+    @classmethod
+    def rebuild_from_logs(cls, dirpath: str = "logs", n_zones: int = N_ZONES, session_gap_ms: int = SESSION_GAP_MS,
+                          now_ms: Optional[int] = None) -> "OccupancyStats":
+        """
+        Recalcule les agrégats depuis les fichiers jour (.csv / .csv.gz), calculs vectorisés NumPy.
+        La dernière session reste ouverte (visites en cours) si elle date de moins de session_gap_ms
+        avant now_ms (heure courante par défaut).
+        """
+        import numpy as np  # dépendance optionnelle, seulement pour le mode batch
+
+        ids: Dict[str, int] = {}
+        mice, zones, codes, tss = [], [], [], []
+        for fname in list_day_files(dirpath):
+            for mid, z, ev, ts in iter_raw_events(os.path.join(dirpath, fname)):
+                code = EVENT_CODES.get(ev)
+                if code not in (EV_ENTER, EV_LEAVE) or not (0 <= z < n_zones):
+                    continue
+                mice.append(ids.setdefault(mid, len(ids)))
+                zones.append(z); codes.append(code); tss.append(ts)
+
+        stats = cls(n_zones)
+        if not mice:
+            return stats
+        m = np.asarray(mice, dtype=np.int64)
+        z = np.asarray(zones, dtype=np.int64)
+        c = np.asarray(codes, dtype=np.int8)
+        t = np.asarray(tss, dtype=np.int64)
+        # sessions, dans l'ordre du journal : coupure à chaque silence > session_gap_ms
+        cut = np.diff(t) > session_gap_ms
+        s = np.concatenate(([0], np.cumsum(cut)))
+        sess_end = t[np.flatnonzero(np.append(cut, True))]  # dernier événement de chaque session
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        live_sess = int(s[-1]) if now_ms - int(t[-1]) <= session_gap_ms else -1
+
+        order = np.argsort(m, kind="stable")  # par souris, ordre du journal conservé
+        m, z, c, t, s = m[order], z[order], c[order], t[order], s[order]
+        n_m = len(ids)
+
+        enter = c == EV_ENTER
+        # fin de visite : événement suivant de la même souris dans la même session
+        # (leave, ou enter si leave manquant), sinon fin de la session
+        nxt_same = np.zeros(len(m), dtype=bool)
+        nxt_same[:-1] = (m[1:] == m[:-1]) & (s[1:] == s[:-1])
+        closed = enter & nxt_same
+        dwell = np.zeros((n_m, n_zones), dtype=np.int64)
+        i = np.flatnonzero(closed)
+        np.add.at(dwell, (m[i], z[i]), t[i + 1] - t[i])
+        i = np.flatnonzero(enter & ~nxt_same & (s != live_sess))
+        np.add.at(dwell, (m[i], z[i]), sess_end[s[i]] - t[i])
+
+        visits = np.zeros((n_m, n_zones), dtype=np.int64)
+        np.add.at(visits, (m[enter], z[enter]), 1)
+
+        # transitions : entrées successives d'une même souris dans une même session
+        e = np.flatnonzero(enter)
+        trans = np.zeros((n_m, n_zones, n_zones), dtype=np.int64)
+        if len(e) > 1:
+            same = (m[e[1:]] == m[e[:-1]]) & (s[e[1:]] == s[e[:-1]])
+            a, b = e[:-1][same], e[1:][same]
+            np.add.at(trans, (m[a], z[a], z[b]), 1)
+
+        # état courant (session en cours seulement) : visite ouverte (dernier événement = enter),
+        # zone de la dernière entrée
+        last = np.flatnonzero(~nxt_same & (s == live_sess))
+        last_enter = np.full(n_m, -1, dtype=np.int64)
+        e = e[s[e] == live_sess]
+        last_enter[m[e]] = e  # indices croissants : la dernière entrée de chaque souris l'emporte
+        for mid, code in ids.items():
+            st = stats._mice[mid] = _MouseStats(n_zones)
+            st.dwell = dwell[code].tolist()
+            st.visits = visits[code].tolist()
+            st.trans = trans[code].ravel().tolist()
+            if last_enter[code] >= 0:
+                st.prev = int(z[last_enter[code]])
+        names = list(ids)
+        for k in last.tolist():
+            if c[k] == EV_ENTER:
+                st = stats._mice[names[m[k]]]
+                st.zone, st.since = int(z[k]), int(t[k])
+        return stats
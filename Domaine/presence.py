@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Etat de présence souris x zone et calcul des événements (enter/stay/leave) par différence.
+
+Chaque mouse_id reçoit un slot entier dense ; la présence est un vecteur zone[slot]
+(ABSENT si hors de toute zone). Un flush est comparé au précédent en une passe vectorisée
+(NumPy si disponible, sinon ensembles Python) : seuls les changements repassent en Python.
+"""
+from typing import Dict, List, Tuple
+
+from Stockage.history_csv import EV_ENTER, EV_STAY, EV_LEAVE
+
+try:
+    import numpy as np
+except ImportError:  # dépendance optionnelle : repli sur les ensembles Python
+    np = None
+
+ABSENT = -32768  # zone "aucune" (int16 min ; -1 reste une zone valide)
+_NO_EVENT = -1
+
+
+class PresenceTable:
+    """
+    diff(courant) -> [(mouse_id, zone_idx, code), ...] dans l'ordre : sorties, entrées, présences.
+    Un déplacement donne une sortie de l'ancienne zone puis une entrée dans la nouvelle ;
+    une présence (stay) n'est émise qu'une fois par séjour, comme avant.
+    """
+
+    def __init__(self, capacity: int = 64, use_numpy: bool = True):
+        self._slots: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._np = use_numpy and np is not None
+        if self._np:
+            cap = max(1, int(capacity))
+            self._zone = np.full(cap, ABSENT, dtype=np.int16)
+            self._last = np.full(cap, _NO_EVENT, dtype=np.int8)  # dernier code émis par slot
+        else:
+            self._present: Dict[str, int] = {}
+            self._stayed = set()
+
+    def __len__(self) -> int:
+        if not self._np:
+            return len(self._present)
+        return int(np.count_nonzero(self._zone[:len(self._names)] != ABSENT))
+
+    def _slot(self, name: str) -> int:
+        s = self._slots.get(name)
+        if s is None:
+            s = self._slots[name] = len(self._names)
+            self._names.append(name)
+            if s >= self._zone.shape[0]:  # croissance géométrique
+                grow = self._zone.shape[0]
+                self._zone = np.concatenate([self._zone, np.full(grow, ABSENT, dtype=np.int16)])
+                self._last = np.concatenate([self._last, np.full(grow, _NO_EVENT, dtype=np.int8)])
+        return s
+
+    def present(self) -> Dict[str, int]:
+        """mouse_id -> zone des souris actuellement présentes."""
+        if not self._np:
+            return dict(self._present)
+        idx = np.flatnonzero(self._zone[:len(self._names)] != ABSENT)
+        names = self._names
+        return dict(zip((names[i] for i in idx.tolist()), self._zone[idx].tolist()))
+
+    def state(self):
+        """(mouse_id -> zone, mouse_id -> dernier code émis) des souris présentes, pour le point de reprise."""
+        present = self.present()
+        if not self._np:
+            return present, {m: (EV_STAY if m in self._stayed else EV_ENTER) for m in present}
+        slots = self._slots
+        return present, {m: int(self._last[slots[m]]) for m in present}
+
+    def restore(self, presence: Dict[str, int], last: Dict[str, int]):
+        """Remet un état sauvegardé par state() ; le prochain diff() le réconcilie avec la trame reçue."""
+        self.clear()
+        if not self._np:
+            self._present = dict(presence)
+            self._stayed = {m for m in presence if last.get(m) == EV_STAY}
+            return
+        for m, z in presence.items():
+            i = self._slot(m)
+            self._zone[i] = z
+            self._last[i] = last.get(m, EV_ENTER)
+
+    def clear(self):
+        if self._np:
+            self._zone.fill(ABSENT)
+            self._last.fill(_NO_EVENT)
+        else:
+            self._present.clear()
+            self._stayed.clear()
+
+    def diff(self, current: Dict[str, int]) -> List[Tuple[str, int, int]]:
+        if not self._np:
+            return self._diff_sets(current)
+        slots = self._slots
+        if not slots.keys() >= current.keys():
+            for name in current:
+                if name not in slots:
+                    self._slot(name)
+        idx = np.fromiter(map(slots.__getitem__, current), dtype=np.intp, count=len(current))
+        n = len(self._names)
+        cur = np.full(n, ABSENT, dtype=np.int16)
+        cur[idx] = np.fromiter(current.values(), dtype=np.int16, count=len(current))
+        prev = self._zone[:n]
+        last = self._last[:n]
+
+        was, now = prev != ABSENT, cur != ABSENT
+        same = prev == cur
+        leave = was & ~same          # sortie ou déplacement (zone précédente)
+        enter = now & ~same          # entrée ou déplacement (nouvelle zone)
+        stay = now & same & (last != EV_STAY)
+
+        names = self._names
+        out = [(names[i], z, EV_LEAVE) for i, z in zip(*self._pick(leave, prev))]
+        out += [(names[i], z, EV_ENTER) for i, z in zip(*self._pick(enter, cur))]
+        out += [(names[i], z, EV_STAY) for i, z in zip(*self._pick(stay, cur))]
+
+        last[leave] = EV_LEAVE
+        last[enter] = EV_ENTER
+        last[stay] = EV_STAY
+        prev[:] = cur
+        return out
+
+    @staticmethod
+    def _pick(mask, zones):
+        i = np.flatnonzero(mask)
+        return i.tolist(), zones[i].tolist()
+
+    def _diff_sets(self, current: Dict[str, int]) -> List[Tuple[str, int, int]]:
+        prev = self._present
+        moved = {m for m in current.keys() & prev.keys() if current[m] != prev[m]}
+        gone = prev.keys() - current.keys()
+        new = current.keys() - prev.keys()
+        out = [(m, prev[m], EV_LEAVE) for m in sorted(gone | moved)]
+        out += [(m, current[m], EV_ENTER) for m in sorted(new | moved)]
+        stay = (current.keys() & prev.keys()) - moved - self._stayed
+        out += [(m, current[m], EV_STAY) for m in sorted(stay)]
+        self._stayed -= gone | moved
+        self._stayed |= stay
+        self._present = dict(current)
+        return out
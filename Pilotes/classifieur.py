@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Classement des lignes reçues de la carte, en une passe, dans le thread du lecteur série.
+
+Chaque ligne est typée une seule fois d'après son préfixe, puis remise aux seuls abonnés de son type :
+- MSG_ZONES  "Z:xx ID:a,b;Z:yy ID:"    -> {zone_idx (0-based): [ids]} (liste vide si aucun ID)
+- MSG_ANT    "#piANT=n"                -> n
+- MSG_LIST   "#piLIST=1,2,5"           -> [1, 2, 5]
+- MSG_DEBUG  "#piDEBUG: DRIVER=.. GPIO=.. LS=.. CODE=0x.." -> (driver, gpio, ls, "CODE")
+- MSG_PI     autre ligne "#pi..."      -> None (texte pour la console)
+- MSG_OTHER  tout le reste             -> None
+MSG_RAW reçoit toutes les lignes telles quelles, avant classement.
+Le texte transmis avec MSG_ANT/LIST/DEBUG/PI est la ligne sans le marqueur "#pi".
+Les abonnements peuvent changer depuis un autre thread (copie à l'écriture).
+Les abonnés qui regroupent leurs envois (lots) s'enregistrent aussi comme « tickers » :
+le lecteur appelle tick() à chaque réveil et borne son attente par l'échéance retournée.
+"""
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+MSG_RAW = "raw"
+MSG_ZONES = "zones"
+MSG_ANT = "ant"
+MSG_LIST = "list"
+MSG_DEBUG = "debug"
+MSG_PI = "pi"
+MSG_OTHER = "other"
+
+PI_MARK = "#pi"
+
+_RE_ANT = re.compile(r"^\s*ANT\s*=\s*(\d+)\s*$")
+_RE_LIST = re.compile(r"^\s*LIST\s*=\s*([\d,\s;]+)\s*$")
+_RE_DEBUG = re.compile(r"^DEBUG:\s+DRIVER=(\d+)\s+GPIO=(\d+)\s+LS=(\d+)\s+CODE=0x([0-9A-Fa-f]{2})\s*$")
+_RE_SEP = re.compile(r"[,\s;]+")
+
+Message = Tuple[str, str, object]  # (type, texte, valeur)
+
+
+def parse_zones(line: str) -> Optional[Dict[int, List[str]]]:
+    """'Z:01 ID:a,b;Z:02 ID:' -> {0: [a, b], 1: []} ; None si illisible.
+    Les zones lues sans ID sont gardées (liste vide) : elles marquent l'antenne comme scrutée."""
+    mapping = {}
+    try:
+        for p in line.split(";"):
+            p = p.strip()
+            if not p:
+                continue
+            if p.startswith("Z:"):
+                z_part, id_part = p.split("ID:")
+                idx0 = int(z_part.replace("Z:", "").strip()) - 1
+                mapping[idx0] = [s.strip() for s in id_part.split(",") if s.strip()]
+        return mapping
+    except Exception:
+        return None
+
+
+def classify(line: str) -> Message:
+    """Ligne (sans fin de ligne) -> (type, texte, valeur). Une seule expression appliquée au plus."""
+    if PI_MARK in line:
+        text = line.replace(PI_MARK, "").strip()
+        if text.startswith("ANT"):
+            m = _RE_ANT.match(text)
+            if m:
+                return MSG_ANT, text, int(m.group(1))
+        elif text.startswith("LIST"):
+            m = _RE_LIST.match(text)
+            if m:
+                nums = [int(tok) for tok in _RE_SEP.split(m.group(1).strip()) if tok.isdigit()]
+                return MSG_LIST, text, nums
+        elif text.startswith("DEBUG"):
+            m = _RE_DEBUG.match(text)
+            if m:
+                return MSG_DEBUG, text, (int(m.group(1)), int(m.group(2)), int(m.group(3)), m.group(4).upper())
+        return MSG_PI, text, None
+    if "Z:" in line:
+        mapping = parse_zones(line)
+        if mapping is not None:
+            return MSG_ZONES, line, mapping
+    return MSG_OTHER, line, None
+
+
+class LineDispatcher:
+    """Abonnés par type de message ; dispatch() classe la ligne une fois et n'appelle que les concernés."""
+
+    def __init__(self):
+        self._subs: Dict[str, Tuple[Callable, ...]] = {}
+        self._tickers: Tuple[Callable, ...] = ()
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}  # lignes remises par type
+
+    def subscribe(self, kind: str, callback: Callable[[str, str, object], None]):
+        with self._lock:
+            subs = dict(self._subs)
+            subs[kind] = subs.get(kind, ()) + (callback,)
+            self._subs = subs
+
+    def unsubscribe(self, kind: str, callback: Callable):
+        with self._lock:
+            subs = dict(self._subs)
+            rest = tuple(cb for cb in subs.get(kind, ()) if cb != callback)
+            if rest:
+                subs[kind] = rest
+            else:
+                subs.pop(kind, None)
+            self._subs = subs
+
+    def wants(self, kind: str) -> bool:
+        return kind in self._subs
+
+    def add_ticker(self, ticker: Callable[[float, bool], Optional[float]]):
+        """ticker(now_monotonic, force) -> secondes avant le prochain appel nécessaire, ou None."""
+        with self._lock:
+            self._tickers = self._tickers + (ticker,)
+
+    def tick(self, force: bool = False) -> Optional[float]:
+        """Appelé par le lecteur à chaque réveil (force=True à l'arrêt) ; retourne l'échéance la plus proche."""
+        due = None
+        now = time.monotonic()
+        for ticker in self._tickers:
+            left = ticker(now, force)
+            if left is not None and (due is None or left < due):
+                due = left
+        return due
+
+    def dispatch(self, line: str):
+        subs = self._subs
+        if not subs:
+            return
+        for cb in subs.get(MSG_RAW, ()):
+            cb(MSG_RAW, line, None)
+        if len(subs) == 1 and MSG_RAW in subs:
+            return
+        kind, text, value = classify(line)
+        targets = subs.get(kind)
+        if targets:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+            for cb in targets:
+                cb(kind, text, value)
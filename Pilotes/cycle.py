@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Fenêtre d'agrégation calée sur le cycle de scrutation de la carte (au lieu d'une période fixe).
+
+Une fenêtre se ferme :
+- quand toutes les antennes de la LIST active ont rendu compte (cycle complet) ;
+- quand une zone déjà vue dans la fenêtre se présente à nouveau (le balayage est reparti : utile
+  si la LIST est inconnue ou si la carte n'envoie pas les zones vides) ;
+- au plafond : CYCLE_MARGIN x RATE x nb d'antennes si RATE et LIST sont connus, sinon ceiling_s.
+RATE / LIST sont appris des commandes qui passent par le pont (on_command) et de l'écho #piLIST= (set_list).
+Les zones sont 0-based (Z:1 / antenne 1 -> 0).
+"""
+import re
+from typing import Iterable, Optional
+
+CYCLE_CEILING_S = 2.0   # plafond quand la durée du cycle est inconnue
+CYCLE_MARGIN = 1.5      # plafond = marge x durée théorique du cycle
+
+_RE_RATE = re.compile(r"^\s*RATE\s+(\d+)\s*$", re.IGNORECASE)
+_RE_LIST = re.compile(r"^\s*LIST\s+([\d,\s;]+)$", re.IGNORECASE)
+
+
+class ScanCycle:
+    def __init__(self, ceiling_s: float = CYCLE_CEILING_S):
+        self.ceiling_s = float(ceiling_s)
+        self.active: Optional[frozenset] = None  # zones attendues par cycle (None = inconnu)
+        self.rate_ms: Optional[int] = None        # durée par antenne
+        self._seen = set()
+        self._opened: Optional[float] = None      # instant (monotonic) d'ouverture de la fenêtre
+        self.complete = 0   # fenêtres fermées par cycle complet
+        self.wrapped = 0    # ... par retour sur une zone déjà vue
+        self.timeouts = 0   # ... au plafond
+
+    # --- Configuration ---
+    def on_command(self, cmd: str) -> bool:
+        """Commande envoyée à la carte ; True si RATE ou LIST a changé la fenêtre."""
+        m = _RE_RATE.match(cmd)
+        if m:
+            self.rate_ms = int(m.group(1))
+            return True
+        m = _RE_LIST.match(cmd)
+        if m:
+            self.set_list(int(tok) for tok in re.split(r"[,\s;]+", m.group(1).strip()) if tok.isdigit())
+            return True
+        return False
+
+    def set_list(self, antennas: Iterable[int]):
+        """Antennes actives (1-based, comme LIST / #piLIST=)."""
+        zones = frozenset(a - 1 for a in antennas if a >= 1)
+        self.active = zones or None
+
+    def window_s(self) -> float:
+        if self.rate_ms and self.active:
+            return CYCLE_MARGIN * self.rate_ms * len(self.active) / 1000.0
+        return self.ceiling_s
+
+    # --- Fenêtre courante ---
+    def wraps(self, zones: Iterable[int]) -> bool:
+        """True si l'une des zones a déjà rendu compte dans la fenêtre : fermer avant d'ajouter."""
+        seen = self._seen
+        if any(z in seen for z in zones):
+            self.wrapped += 1
+            return True
+        return False
+
+    def add(self, zones: Iterable[int], now: float) -> bool:
+        """Enregistre les zones lues ; True si le cycle est complet (fermer la fenêtre)."""
+        if self._opened is None:
+            self._opened = now
+        self._seen.update(zones)
+        if self.active is not None and self.active <= self._seen:
+            self.complete += 1
+            return True
+        return False
+
+    def time_left(self, now: float) -> Optional[float]:
+        """Secondes avant le plafond (None = fenêtre vide)."""
+        if self._opened is None:
+            return None
+        return self.window_s() - (now - self._opened)
+
+    def expired(self, now: float) -> bool:
+        left = self.time_left(now)
+        if left is not None and left <= 0:
+            self.timeouts += 1
+            return True
+        return False
+
+    def reset(self):
+        self._seen.clear()
+        self._opened = None
+
+    def stats(self) -> dict:
+        return {"complete": self.complete, "wrapped": self.wrapped, "timeouts": self.timeouts,
+                "rate_ms": self.rate_ms, "active": sorted(z + 1 for z in self.active) if self.active else None,
+                "window_s": round(self.window_s(), 3)}
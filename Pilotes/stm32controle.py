@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 from PyQt5 import QtCore
 
+# Clé optionnelle des trames : epoch ms de réception de la 1re lecture agrégée (les clés non entières
+# sont ignorées comme zones). Absente : le domaine horodate à la réception de la trame.
+FRAME_TS_KEY = "ts_ms"
+
 class STM32Controle(QtCore.QObject):
     updated = QtCore.pyqtSignal(dict)  # {zone_idx: [id1, ...]} OR backend forms
     def start(self): ...
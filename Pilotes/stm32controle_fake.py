@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 import random
+import time
 from PyQt5 import QtCore
-from Pilotes.stm32controle import STM32Controle
+from Pilotes.stm32controle import STM32Controle, FRAME_TS_KEY
 
 class STM32ControleFake(STM32Controle):
     def __init__(self, parent=None, period_ms=600, pool_size=30, max_per_zone=3):
@@ -44,4 +45,5 @@ class STM32ControleFake(STM32Controle):
                 if len(lst) < self.max_per_zone:
                     lst.append(mouse_id)
                     break
+        mapping[FRAME_TS_KEY] = int(time.time() * 1000)
         self.updated.emit(mapping)
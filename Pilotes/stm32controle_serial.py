@@ -1,19 +1,121 @@
 # -*- coding: utf-8 -*-
 import logging
+import os
+import selectors
+import threading
 import time
 import queue
 from PyQt5 import QtCore
-from Pilotes.stm32controle import STM32Controle
+from Pilotes.stm32controle import STM32Controle, FRAME_TS_KEY
+from Pilotes.classifieur import LineDispatcher, MSG_RAW, MSG_ZONES, MSG_LIST
+from Pilotes.cycle import ScanCycle, CYCLE_CEILING_S
+from Utils.framer import LineFramer
 
 APP_LOGGER_NAME = "app"
 
+READER_SELECT = "select"  # attente sur le descripteur du port + tube de réveil (POSIX)
+READER_POLL = "poll"      # read() avec timeout de 50 ms (Windows, ou repli)
+
 class SerialBridge(QtCore.QObject):
-    """Pont pour partager le port série entre plusieurs fenêtres."""
-    line = QtCore.pyqtSignal(str)          # lignes brutes (str)
+    """
+    Pont pour partager le port série entre plusieurs fenêtres.
+    Les lignes sont classées une fois dans le thread du lecteur (LineDispatcher) ; seuls les types
+    souscrits par subscribe() traversent vers le thread GUI, déjà analysés, par lots (messages) :
+    un lot part dès max_batch messages, ou max_latency_ms après le premier message en attente.
+    """
+    line = QtCore.pyqtSignal(str)          # lignes brutes une à une (compat), seulement si quelqu'un y est connecté
+    messages = QtCore.pyqtSignal(list)     # [(type, texte, valeur), ...] des types souscrits
     connected = QtCore.pyqtSignal(str)     # nom de port
     disconnected = QtCore.pyqtSignal()
     _writeRequested = QtCore.pyqtSignal(str)
 
+    def __init__(self, parent=None, max_latency_ms: int = 50, max_batch: int = 256):
+        super().__init__(parent)
+        self.dispatcher = LineDispatcher()
+        self.dispatcher.add_ticker(self._tick)
+        self._kinds = set()
+        self.configure_batching(max_latency_ms, max_batch)
+        # Lot en cours : rempli et envoyé par le thread du lecteur uniquement
+        self._pending = []
+        self._first = 0.0  # instant (monotonic) du 1er message en attente
+        # Compteurs (lot envoyé par le lecteur, reçu côté GUI)
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.in_flight = 0      # lots émis pas encore traités par le thread GUI
+        self.max_in_flight = 0
+        self.messages.connect(self._on_delivered)  # file d'événements du thread GUI
+
+    def configure_batching(self, max_latency_ms: int = None, max_batch: int = None):
+        """max_latency_ms=0 ou max_batch=1 : un envoi par message (comportement sans lots)."""
+        if max_latency_ms is not None:
+            self.max_latency_s = max(0, int(max_latency_ms)) / 1000.0
+        if max_batch is not None:
+            self.max_batch = max(1, int(max_batch))
+
+    def subscribe(self, *kinds: str):
+        """Types de message (Pilotes.classifieur.MSG_*) à relayer vers les fenêtres."""
+        for kind in kinds:
+            if kind not in self._kinds:
+                self._kinds.add(kind)
+                self.dispatcher.subscribe(kind, self._relay)
+
+    def _relay(self, kind: str, text: str, value):
+        # Thread du lecteur : mise en lot, rien ne traverse avant _send()
+        pending = self._pending
+        pending.append((kind, text, value))
+        if len(pending) == 1:
+            self._first = time.monotonic()
+        if len(pending) >= self.max_batch or self.max_latency_s == 0:
+            self._send()
+
+    def _tick(self, now: float, force: bool = False):
+        if not self._pending:
+            return None
+        left = self.max_latency_s - (now - self._first)
+        if force or left <= 0:
+            self._send()
+            return None
+        return left
+
+    def _send(self):
+        batch, self._pending = self._pending, []
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.messages.emit(batch)  # un seul événement en file pour tout le lot
+
+    @QtCore.pyqtSlot(list)
+    def _on_delivered(self, batch: list):
+        with self._stats_lock:
+            self.in_flight -= 1
+        if self.receivers(self.line):
+            for kind, text, _ in batch:
+                if kind == MSG_RAW:
+                    self.line.emit(text)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "messages": self.items,
+                "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "max_latency_ms": int(self.max_latency_s * 1000),
+                "max_batch": self.max_batch,
+            }
+
+    def connectNotify(self, signal):
+        # Compat : se connecter à line suffit pour recevoir les lignes brutes
+        if bytes(signal.name()) == b"line":
+            self.subscribe(MSG_RAW)
+
     @QtCore.pyqtSlot(str)
     def write_line(self, s: str):
         # Appel côté GUI secondaire (pe42582_gui)
@@ -21,16 +123,20 @@ class SerialBridge(QtCore.QObject):
 
 
 class STM32ControleSerial(STM32Controle):
-    def __init__(self, port: str = "COM3", baudrate: int = 115200, parent=None, logger=None):
+    def __init__(self, port: str = "COM3", baudrate: int = 115200, parent=None, logger=None,
+                 reader: str = READER_SELECT, batch_latency_ms: int = 50, batch_max: int = 256,
+                 cycle_ceiling_s: float = CYCLE_CEILING_S):
         super().__init__(parent)
         self._port = port
         self._baud = baudrate
+        self._reader = reader
+        self._cycle_ceiling_s = cycle_ceiling_s
         self._thread = None
         self._worker = None
         self.logger = logger or logging.getLogger(APP_LOGGER_NAME)
         self.logger.info(f"STM32ControleSerial initialisé avec port={port}, baudrate={baudrate}")
         # Bridge partagé pour les autres fenêtres (PE42582)
-        self._bridge = SerialBridge()
+        self._bridge = SerialBridge(max_latency_ms=batch_latency_ms, max_batch=batch_max)
 
     def get_bridge(self) -> SerialBridge:
         return self._bridge
@@ -49,7 +155,8 @@ class STM32ControleSerial(STM32Controle):
             return
         self.logger.info("Démarrage du thread de communication série.")
         self._thread = QtCore.QThread()
-        self._worker = _SerialWorker(self._port, self._baud, logger=self.logger)
+        self._worker = _SerialWorker(self._port, self._baud, logger=self.logger, reader=self._reader,
+                                     dispatcher=self._bridge.dispatcher, cycle_ceiling_s=self._cycle_ceiling_s)
         self._worker.moveToThread(self._thread)
 
         # Flux agrégé existant (Afficheur 3x5)
@@ -58,8 +165,7 @@ class STM32ControleSerial(STM32Controle):
         # Connexion d'émission : on empile en DirectConnection (pas d'event loop dans le worker)
         self._bridge._writeRequested.connect(self._worker.enqueue_tx, QtCore.Qt.DirectConnection)
 
-        # Partage de réception/état vers le bridge
-        self._worker.raw_line.connect(self._bridge.line)
+        # Partage de réception/état vers le bridge (les lignes passent par bridge.dispatcher)
         self._worker.connected.connect(self._bridge.connected)
         self._worker.disconnected.connect(self._bridge.disconnected)
 
@@ -90,22 +196,29 @@ class _SerialWorker(QtCore.QObject):
     # Sortie « agrégée » pour Afficheur
     updated = QtCore.pyqtSignal(dict)
     # Sorties pour le port partagé
-    raw_line = QtCore.pyqtSignal(str)
     connected = QtCore.pyqtSignal(str)
     disconnected = QtCore.pyqtSignal()
 
-    def __init__(self, port, baud, logger=None):
+    def __init__(self, port, baud, logger=None, reader: str = READER_SELECT, dispatcher: LineDispatcher = None,
+                 cycle_ceiling_s: float = CYCLE_CEILING_S):
         super().__init__()
         self._running = True
         self._port = port
         self._baud = baud
         self._ser = None
+        self._reader = reader
+        self._wake_r = self._wake_w = None  # tube de réveil (mode select)
+        self._wake_lock = threading.Lock()  # écriture / fermeture de _wake_w (le n° de fd peut être réutilisé)
         self.logger = logger or logging.getLogger(APP_LOGGER_NAME)
-        self.logger.info(f"_SerialWorker initialisé avec port={port}, baud={baud}")
+        self.logger.info(f"_SerialWorker initialisé avec port={port}, baud={baud}, lecteur={reader}")
 
         # Agrégation pour l'afficheur
         self._acc = {}          # { zone_idx: set(ids) }
-        self._last_emit = time.monotonic()
+        self._acc_ms = 0        # epoch ms de réception de la 1re lecture agrégée
+        self._cycle = ScanCycle(cycle_ceiling_s)  # fenêtre = un cycle de scrutation (RATE / LIST)
+        self._framer = LineFramer()
+        self._dispatcher = dispatcher or LineDispatcher()  # lignes classées une fois, remises aux abonnés
+        self._rx_ms = 0
 
         # ✅ File de transmission thread-safe
         self._tx = queue.Queue()
@@ -117,12 +230,20 @@ class _SerialWorker(QtCore.QObject):
             self._tx.put_nowait(str(s))
         except Exception:
             pass
+        self._wake()
 
     # Compat : si quelqu'un appelait write_line auparavant
     @QtCore.pyqtSlot(str)
     def write_line(self, s: str):
         self.enqueue_tx(s)
 
+    def _wake(self):
+        """Réveille le select() du worker (TX en attente ou arrêt)."""
+        with self._wake_lock:
+            if self._wake_w is not None:
+                try: os.write(self._wake_w, b"\0")
+                except OSError: pass  # tube plein : un réveil est déjà en attente
+
     @QtCore.pyqtSlot()
     def run(self):
         self.logger.info("Thread worker série lancé.")
@@ -133,7 +254,7 @@ class _SerialWorker(QtCore.QObject):
             self._running = False
             return
         try:
-            # Timeout court -> bonne réactivité pour drainer la TX
+            # Timeout court -> bonne réactivité pour drainer la TX (mode poll)
             ser = serial.Serial(self._port, self._baud, timeout=0.05, write_timeout=0.5)
             self._ser = ser
             self.logger.info(f"Connexion série établie sur {self._port} à {self._baud} bauds.")
@@ -143,36 +264,102 @@ class _SerialWorker(QtCore.QObject):
             self._running = False
             return
 
+        self._dispatcher.subscribe(MSG_ZONES, self._on_zones)
+        self._dispatcher.subscribe(MSG_LIST, self._on_list)
         try:
             with self._ser as ser:
-                buf = b""
-                while self._running:
-                    # 🔁 Draine ce qu'on a à envoyer AVANT la lecture
-                    self._drain_tx(ser)
+                # select() sur le descripteur du port : POSIX seulement (pas de fileno() sous Windows)
+                if self._reader == READER_SELECT and os.name == "posix" and hasattr(ser, "fileno"):
+                    self._run_select(ser, serial.SerialException)
+                else:
+                    self._run_poll(ser)
+        finally:
+            self._dispatcher.tick(force=True)  # dernier lot en attente
+            self._dispatcher.unsubscribe(MSG_ZONES, self._on_zones)
+            self._dispatcher.unsubscribe(MSG_LIST, self._on_list)
+            self._ser = None
+            self.disconnected.emit()
 
+    def _run_poll(self, ser):
+        """Boucle historique : read(256) avec timeout de 50 ms."""
+        while self._running:
+            # 🔁 Draine ce qu'on a à envoyer AVANT la lecture
+            self._drain_tx(ser)
+
+            try:
+                chunk = ser.read(256)
+                self._maybe_flush()
+                if chunk:
+                    self._on_chunk(chunk, int(time.time() * 1000))  # horodatage à la réception
+                self._dispatcher.tick()  # lots du bridge arrivés à échéance
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la lecture/décodage: {e}")
+
+    def _run_select(self, ser, serial_error):
+        """
+        Attente bloquante sur le port ET sur un tube de réveil (TX / arrêt) : aucun réveil à vide,
+        les octets sont lus en bloc (in_waiting) dès leur arrivée, les commandes partent aussitôt.
+        Le délai d'attente ne sert qu'à l'émission agrégée périodique.
+        """
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        sel = selectors.DefaultSelector()
+        sel.register(ser.fileno(), selectors.EVENT_READ, "rx")
+        sel.register(self._wake_r, selectors.EVENT_READ, "wake")
+        try:
+            while self._running:
+                self._drain_tx(ser)
+                for key, _ in sel.select(self._next_timeout()):
+                    if key.data == "wake":
+                        try: os.read(self._wake_r, 4096)
+                        except OSError: pass
+                        continue
                     try:
-                        chunk = ser.read(256)
-                        self._maybe_flush()
-                        if not chunk:
-                            continue
-                        buf += chunk
-                        while b"\n" in buf:
-                            line, buf = buf.split(b"\n", 1)
-                            text = line.decode(errors="ignore").strip()
-                            if not text:
-                                continue
-                            # Diffuser la ligne brute (pour pe42582_gui -> filtre #pi)
-                            self.raw_line.emit(text)
-                            # Essayer de parser en mapping Z:..;ID:.. pour l’Afficheur
-                            mapping = self._parse_line(text)
-                            if mapping is not None:
-                                self._accumulate(mapping)
-                                self._maybe_flush()
+                        chunk = ser.read(ser.in_waiting or 1)
+                        if chunk:
+                            self._on_chunk(chunk, int(time.time() * 1000))
+                    except serial_error as e:
+                        # port débranché : readiness sans données, inutile de boucler dessus
+                        self.logger.error(f"Erreur lecture série, arrêt du lecteur: {e}")
+                        self._running = False
                     except Exception as e:
                         self.logger.error(f"Erreur lors de la lecture/décodage: {e}")
+                self._maybe_flush()
         finally:
-            self._ser = None
-            self.disconnected.emit()
+            sel.close()
+            with self._wake_lock:
+                for fd in (self._wake_r, self._wake_w):
+                    try: os.close(fd)
+                    except OSError: pass
+                self._wake_r = self._wake_w = None
+
+    def _next_timeout(self):
+        """Secondes avant le plafond du cycle en cours ou le prochain lot du bridge (None = rien en attente)."""
+        due = self._dispatcher.tick()
+        left = self._cycle.time_left(time.monotonic()) if self._acc else None
+        if left is not None:
+            left = max(0.0, left)
+            due = left if due is None else min(due, left)
+        return due
+
+    def _on_chunk(self, chunk: bytes, rx_ms: int):
+        self._rx_ms = rx_ms
+        dispatch = self._dispatcher.dispatch
+        for text in self._framer.feed(chunk):
+            dispatch(text)  # Z: -> _on_zones ; #pi... -> fenêtres abonnées via le bridge
+
+    def _on_zones(self, kind: str, text: str, mapping: dict):
+        # mapping contient aussi les zones lues sans ID : elles comptent pour la complétude du cycle
+        if self._cycle.wraps(mapping):
+            self._flush()  # le balayage est reparti : la fenêtre précédente est un cycle
+        self._accumulate(mapping, self._rx_ms)
+        if self._cycle.add(mapping, time.monotonic()):
+            self._flush()  # toutes les antennes de la LIST ont rendu compte
+
+    def _on_list(self, kind: str, text: str, antennas: list):
+        # Écho #piLIST= de la carte : fait foi pour les antennes actives
+        self._cycle.set_list(antennas)
 
     def _drain_tx(self, ser):
         """Envoie toutes les commandes en attente."""
@@ -186,6 +373,8 @@ class _SerialWorker(QtCore.QObject):
                 ser.write(payload)
                 ser.flush()
                 self.logger.debug(f"TX: {s}")
+                if self._cycle.on_command(s):  # RATE / LIST : la fenêtre suit le nouveau cycle
+                    self.logger.info(f"Fenêtre d'agrégation : {self._cycle.stats()}")
             except Exception as e:
                 self.logger.error(f"Erreur écriture série: {e}")
                 break
@@ -194,10 +383,12 @@ class _SerialWorker(QtCore.QObject):
     def stop(self):
         self.logger.info("Arrêt du worker série demandé.")
         self._running = False
-        # Pas d'envoi ici : le run() s'arrêtera après le prochain read()
+        self._wake()  # mode poll : le run() s'arrêtera après le prochain read()
 
     # --- Agrégation pour Afficheur ---
-    def _accumulate(self, mapping: dict):
+    def _accumulate(self, mapping: dict, rx_ms: int):
+        if not self._acc:
+            self._acc_ms = rx_ms
         for idx, ids in mapping.items():
             try:
                 z = int(idx)
@@ -209,54 +400,16 @@ class _SerialWorker(QtCore.QObject):
                     bucket.add(mid)
 
     def _maybe_flush(self):
-        now = time.monotonic()
-        if self._acc and (now - self._last_emit) >= 0.6:
-            self._flush(now)
+        # Plafond : cycle incomplet (antenne muette, LIST inconnue) ou carte silencieuse
+        if self._acc and self._cycle.expired(time.monotonic()):
+            self._flush()
 
-    def _flush(self, now=None):
+    def _flush(self):
+        self._cycle.reset()
         if not self._acc:
             return
         merged = {idx: sorted(list(ids)) for idx, ids in self._acc.items()}
+        merged[FRAME_TS_KEY] = self._acc_ms
         self._acc.clear()
-        self._last_emit = now if now is not None else time.monotonic()
         self.logger.info(f"Emission agrégée: {merged}")
         self.updated.emit(merged)
-
-    def _parse_line(self, line: str):
-        line = line.strip()
-        if not line or "Z:" not in line:
-            return None
-        mapping = {}
-        try:
-            parts = line.split(";")
-            for p in parts:
-                p = p.strip()
-                if not p:
-                    continue
-                if p.startswith("Z:"):
-                    z_part, id_part = p.split("ID:")
-                    idx1 = int(z_part.replace("Z:", "").strip())
-                    idx0 = idx1 - 1
-                    ids = [s.strip() for s in id_part.split(",") if s.strip()]
-                    if ids:
-                        mapping[idx0] = ids
-            return mapping
-        except Exception:
-            return None
-
-
-    # def _parse_line(self, line: str):
-    #     line = line.strip()
-    #     if not line or "Z:" not in line:
-    #         return None
-    #     mapping = {}
-    #     try:
-    #         for m in re.finditer(r"Z\s*:\s*(\d+)\s*;?\s*ID\s*:\s*([^\r\n]*)", line):
-    #             idx = int(m.group(1))
-    #             idx1 = idx-1
-    #             ids = [s.strip() for s in m.group(2).split(",") if s.strip()]
-    #             if ids:
-    #                 mapping[idx1] = ids
-    #         return mapping if mapping else None
-    #     except Exception:
-    #         return None
\ No newline at end of file
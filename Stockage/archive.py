@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import gzip
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Iterable, List, Optional, Tuple
+
+APP_LOGGER_NAME = "app"
+
+DAY_SUFFIX = ".csv"
+ARCHIVE_SUFFIX = ".csv.gz"
+
+
+def is_day_file(fname: str) -> bool:
+    return fname.endswith(DAY_SUFFIX) or fname.endswith(ARCHIVE_SUFFIX)
+
+
+def day_of(fname: str) -> str:
+    """'2025-11-12.csv' / '2025-11-12.csv.gz' -> '2025-11-12'."""
+    if fname.endswith(ARCHIVE_SUFFIX):
+        return fname[:-len(ARCHIVE_SUFFIX)]
+    if fname.endswith(DAY_SUFFIX):
+        return fname[:-len(DAY_SUFFIX)]
+    return fname
+
+
+def open_day_text(path: str, encoding: str = "utf-8-sig"):
+    """Ouvre un fichier jour en texte, compressé ou non, de façon transparente."""
+    if path.endswith(ARCHIVE_SUFFIX):
+        return gzip.open(path, "rt", encoding=encoding, newline="")
+    return open(path, "r", encoding=encoding, newline="")
+
+
+def open_day_binary(path: str):
+    if path.endswith(ARCHIVE_SUFFIX):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def list_day_files(dirpath: str) -> List[str]:
+    """
+    Noms des fichiers jour (.csv et .csv.gz) triés par jour.
+    Un jour peut avoir les deux (écriture tardive dans un jour déjà archivé) : l'archive,
+    plus ancienne, vient avant le .csv, et les deux sont à lire.
+    """
+    names = [f for f in os.listdir(dirpath) if is_day_file(f)]
+    return sorted(names, key=lambda f: (day_of(f), not f.endswith(ARCHIVE_SUFFIX)))
+
+
+def group_by_day(names: Iterable[str]) -> List[Tuple[str, List[str]]]:
+    """[(jour, [fichiers du jour])] dans l'ordre de list_day_files (chemins ou noms)."""
+    return [(day, list(group)) for day, group in groupby(names, key=lambda f: day_of(os.path.basename(f)))]
+
+
+def _skip_header(fin):
+    """Positionne fin après l'en-tête CSV s'il y en a un (membre ajouté à une archive existante)."""
+    first = fin.readline()
+    if not first.lstrip(b"\xef\xbb\xbf").startswith(b"timestamp"):
+        fin.seek(0)
+
+
+class LogArchiver:
+    """
+    Compresse en .csv.gz, dans un thread de fond, les fichiers jour plus vieux que N jours.
+    Le fichier du jour (et ceux encore récents) ne sont jamais touchés.
+    """
+
+    def __init__(self, dirpath: str, older_than_days: int = 7, interval_s: float = 3600.0,
+                 on_archived=None, logger=None):
+        self.dir = dirpath
+        self._days = max(1, int(older_than_days))
+        self._interval = max(1.0, float(interval_s))
+        self._on_archived = on_archived  # callback(chemin_csv, chemin_gz)
+        self.logger = logger or logging.getLogger(APP_LOGGER_NAME)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="LogArchiver", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.archive_once()
+            except Exception as e:
+                self.logger.error(f"Erreur archivage des logs: {e}")
+            self._stop.wait(self._interval)
+
+    def _recover(self):
+        """
+        Archive temporaire laissée par un arrêt brutal : complète si son .csv a déjà été supprimé
+        (elle est alors publiée), sinon abandonnée (le .csv et l'archive d'origine sont intacts).
+        """
+        for fname in os.listdir(self.dir):
+            if not fname.endswith(ARCHIVE_SUFFIX + ".tmp"):
+                continue
+            tmp = os.path.join(self.dir, fname)
+            dst = tmp[:-len(".tmp")]
+            try:
+                if os.path.exists(dst[:-len(".gz")]):
+                    os.remove(tmp)
+                else:
+                    os.replace(tmp, dst)
+            except OSError as e:
+                self.logger.error(f"Reprise d'archive impossible ({fname}): {e}")
+
+    def archive_once(self, today: Optional[date] = None) -> List[str]:
+        """Archive les fichiers éligibles ; retourne la liste des .csv.gz produits."""
+        limit = ((today or date.today()) - timedelta(days=self._days)).strftime("%Y-%m-%d")
+        done = []
+        self._recover()
+        for fname in sorted(os.listdir(self.dir)):
+            if self._stop.is_set():
+                break
+            if not fname.endswith(DAY_SUFFIX):
+                continue
+            day = day_of(fname)
+            try:
+                datetime.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                continue  # pas un fichier jour
+            if day >= limit:
+                continue
+            src = os.path.join(self.dir, fname)
+            dst = src + ".gz"
+            tmp = dst + ".tmp"
+            merge = os.path.exists(dst)
+            with open(tmp, "wb") as raw:
+                if merge:
+                    # Jour déjà archivé (écriture tardive) : l'archive est conservée telle quelle et
+                    # le .csv y est ajouté comme membre gzip supplémentaire, sans son en-tête
+                    with open(dst, "rb") as old:
+                        shutil.copyfileobj(old, raw, 1 << 16)
+                with open(src, "rb") as fin, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as fout:
+                    if merge:
+                        _skip_header(fin)
+                    shutil.copyfileobj(fin, fout, 1 << 16)
+            # Le .csv est supprimé AVANT de publier l'archive : jamais les mêmes lignes dans les deux
+            try:
+                os.remove(src)
+            except OSError:
+                os.remove(tmp)
+                continue  # fichier encore ouvert (Windows) : on retentera
+            os.replace(tmp, dst)
+            self.logger.info(f"Archivage: {fname} -> {os.path.basename(dst)}")
+            if self._on_archived is not None:
+                self._on_archived(src, dst)
+            done.append(dst)
+        return done
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import sys
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def _estimate_event_bytes(ev) -> int:
+    """Taille approximative d'un événement en mémoire (objet + attributs non partagés)."""
+    n = sys.getsizeof(ev)
+    d = getattr(ev, "__dict__", None)
+    if d is not None:
+        n += sys.getsizeof(d)
+        if isinstance(d.get("ts"), datetime):
+            n += sys.getsizeof(d["ts"])
+    return n + 8  # pointeur dans la deque
+
+
+class EventCache:
+    """
+    Cache mémoire borné des événements récents :
+    - un ring buffer (deque maxlen) par souris ;
+    - un budget global en nombre d'événements, avec éviction LRU des souris inactives.
+    Chaque buffer est la queue contiguë de l'historique de la souris : toute requête
+    commençant après son premier événement est servie depuis la mémoire, le reste va au disque.
+    Un buffer amorcé avec l'historique complet (seed) sert aussi les requêtes sans début,
+    tant qu'il n'a rien perdu (ni débordement, ni éviction).
+    """
+
+    def __init__(self, per_mouse_capacity: int = 2000, max_events: int = 200_000):
+        self.per_mouse_capacity = max(1, int(per_mouse_capacity))
+        self.max_events = max(self.per_mouse_capacity, int(max_events))
+        self._buffers: "OrderedDict[str, deque]" = OrderedDict()  # ordre = LRU -> MRU
+        self._complete = set()  # souris dont le buffer contient tout l'historique
+        self._appends: Dict[str, int] = {}  # ajouts par souris (détecte un ajout pendant une lecture disque)
+        self._count = 0
+        self._event_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # souris évincées
+
+    def append(self, ev):
+        with self._lock:
+            buf = self._buffers.get(ev.mouse_id)
+            if buf is None:
+                buf = self._buffers[ev.mouse_id] = deque(maxlen=self.per_mouse_capacity)
+            else:
+                self._buffers.move_to_end(ev.mouse_id)
+            if len(buf) < buf.maxlen:
+                self._count += 1
+            else:
+                self._complete.discard(ev.mouse_id)  # le plus ancien est perdu
+            buf.append(ev)
+            self._appends[ev.mouse_id] = self._appends.get(ev.mouse_id, 0) + 1
+            if not self._event_bytes:
+                self._event_bytes = _estimate_event_bytes(ev)
+            while self._count > self.max_events and len(self._buffers) > 1:
+                mid, old = self._buffers.popitem(last=False)
+                self._count -= len(old)
+                self._complete.discard(mid)
+                self.evictions += 1
+
+    def appends(self, mouse_id: str) -> int:
+        with self._lock:
+            return self._appends.get(mouse_id, 0)
+
+    def seed(self, mouse_id: str, events: List, appends: int) -> bool:
+        """
+        Remplace le buffer par l'historique complet lu sur disque, si aucun événement n'a été ajouté
+        depuis appends (valeur de appends() relevée avant la lecture) et s'il tient dans le buffer.
+        """
+        with self._lock:
+            if self._appends.get(mouse_id, 0) != appends or len(events) > self.per_mouse_capacity:
+                return False
+            old = self._buffers.pop(mouse_id, None)
+            self._count -= len(old) if old else 0
+            self._buffers[mouse_id] = deque(events, maxlen=self.per_mouse_capacity)
+            self._count += len(events)
+            self._complete.add(mouse_id)
+            while self._count > self.max_events and len(self._buffers) > 1:
+                mid, old = self._buffers.popitem(last=False)
+                self._count -= len(old)
+                self._complete.discard(mid)
+                self.evictions += 1
+            return True
+
+    def get(self, mouse_id: str, start: Optional[datetime] = None,
+            end: Optional[datetime] = None) -> Optional[List]:
+        """Evénements de [start, end] si entièrement en cache, sinon None (à lire sur disque)."""
+        with self._lock:
+            buf = self._buffers.get(mouse_id)
+            if buf is None:
+                self.misses += 1
+                return None
+            t0 = int(round(start.timestamp() * 1000)) if start is not None else None
+            # historique complet en mémoire, sinon la période doit commencer strictement après
+            # le 1er événement du buffer (un événement de la même ms peut le précéder sur disque)
+            if mouse_id not in self._complete and (t0 is None or not buf or not t0 > buf[0].ts_ms):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._buffers.move_to_end(mouse_id)
+            t1 = int(round(end.timestamp() * 1000)) if end is not None else None
+            return [ev for ev in buf if (t0 is None or ev.ts_ms >= t0) and (t1 is None or ev.ts_ms <= t1)]
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+            self._complete.clear()
+            self._appends.clear()
+            self._count = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "mice": len(self._buffers),
+                "events": self._count,
+                "approx_bytes": self._count * self._event_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "per_mouse_capacity": self.per_mouse_capacity,
+                "max_events": self.max_events,
+            }
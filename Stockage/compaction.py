@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Compaction des cycles enter/stay/leave en visites (enter_ts, leave_ts, zone, nb de lectures).
+
+Un tag au bord d'une antenne produit des leave/enter en rafale pour la même souris et la même
+zone ; une sortie suivie d'une ré-entrée dans la même zone en moins de merge_gap_ms est fusionnée
+dans la visite en cours. Fichiers produits : logs/visits/<jour>.csv
+    enter_ts;leave_ts;mouse_id;zone_idx;reads   (leave_ts vide = visite encore ouverte)
+"""
+import csv, os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Stockage.archive import group_by_day, list_day_files, open_day_text
+
+VISITS_DIRNAME = "visits"
+VISITS_HEADER = ["enter_ts", "leave_ts", "mouse_id", "zone_idx", "reads"]
+DEFAULT_MERGE_GAP_MS = 2000
+# Rejeu du journal : aucun événement pendant plus longtemps = acquisition arrêtée (fin de session),
+# les présences encore ouvertes sont refermées au dernier événement connu
+SESSION_GAP_MS = 3600 * 1000
+
+
+def _ms(ts: datetime) -> int:
+    return int(round(ts.timestamp() * 1000))
+
+
+def _iso(ms: Optional[int]) -> str:
+    return "" if ms is None else datetime.fromtimestamp(ms / 1000.0).isoformat(timespec="milliseconds")
+
+
+class Visit:
+    __slots__ = ("mouse_id", "zone_idx", "enter_ms", "leave_ms", "reads")
+
+    def __init__(self, mouse_id: str, zone_idx: int, enter_ms: int, leave_ms: Optional[int] = None, reads: int = 1):
+        self.mouse_id = mouse_id
+        self.zone_idx = zone_idx
+        self.enter_ms = enter_ms
+        self.leave_ms = leave_ms
+        self.reads = reads
+
+    @property
+    def enter_ts(self) -> datetime:
+        return datetime.fromtimestamp(self.enter_ms / 1000.0)
+
+    @property
+    def leave_ts(self) -> Optional[datetime]:
+        return None if self.leave_ms is None else datetime.fromtimestamp(self.leave_ms / 1000.0)
+
+    def to_row(self) -> list:
+        return [_iso(self.enter_ms), _iso(self.leave_ms), self.mouse_id, self.zone_idx, self.reads]
+
+    def __repr__(self):
+        return (f"Visit({self.mouse_id!r}, zone={self.zone_idx}, {_iso(self.enter_ms)} -> "
+                f"{_iso(self.leave_ms) or '…'}, reads={self.reads})")
+
+
+class VisitCompactor:
+    """
+    Compaction en ligne : feed() consomme les événements dans l'ordre et retourne les visites
+    devenues définitives. Une sortie reste « en suspens » merge_gap_ms avant d'être validée.
+    """
+
+    def __init__(self, merge_gap_ms: int = DEFAULT_MERGE_GAP_MS):
+        self.merge_gap_ms = int(merge_gap_ms)
+        self._open: Dict[str, Visit] = {}     # visite en cours par souris
+        self._pending: Dict[str, Visit] = {}  # visite sortie, fusionnable jusqu'à leave_ms + gap
+        self.rows_in = 0
+        self.visits_out = 0
+
+    def feed(self, mouse_id: str, zone_idx: int, event: str, ts_ms: int) -> List[Visit]:
+        self.rows_in += 1
+        done: List[Visit] = []
+        pend = self._pending.pop(mouse_id, None)
+        if pend is not None:
+            if event != "leave" and pend.zone_idx == zone_idx and ts_ms - pend.leave_ms <= self.merge_gap_ms:
+                pend.leave_ms = None  # ré-entrée rapide : même visite
+                pend.reads += 1
+                self._open[mouse_id] = pend
+                return done
+            done.append(pend)
+        cur = self._open.get(mouse_id)
+        if event == "leave":
+            # une sortie ferme la visite ouverte, même si elle cite une autre zone
+            if cur is not None:
+                cur.leave_ms = ts_ms
+                cur.reads += cur.zone_idx == zone_idx
+                del self._open[mouse_id]
+                self._pending[mouse_id] = cur
+        elif cur is not None and cur.zone_idx == zone_idx:
+            cur.reads += 1
+        else:
+            if cur is not None:  # changement de zone sans leave explicite
+                cur.leave_ms = ts_ms
+                done.append(cur)
+            self._open[mouse_id] = Visit(mouse_id, zone_idx, ts_ms)
+        self.visits_out += len(done)
+        return done
+
+    def expire(self, now_ms: int) -> List[Visit]:
+        """Valide les sorties en suspens depuis plus de merge_gap_ms."""
+        done = [v for v in self._pending.values() if now_ms - v.leave_ms > self.merge_gap_ms]
+        for v in done:
+            del self._pending[v.mouse_id]
+        self.visits_out += len(done)
+        return done
+
+    def close_all(self, ts_ms: Optional[int] = None) -> List[Visit]:
+        """
+        Fin de flux : sorties en suspens validées, visites ouvertes rendues
+        (leave_ms=None, ou ts_ms si donné : fin de session).
+        """
+        if ts_ms is not None:
+            for v in self._open.values():
+                v.leave_ms = ts_ms
+        done = list(self._pending.values()) + list(self._open.values())
+        self._pending.clear()
+        self._open.clear()
+        self.visits_out += len(done)
+        done.sort(key=lambda v: v.enter_ms)
+        return done
+
+    def open_visits(self) -> List[Visit]:
+        return list(self._open.values()) + list(self._pending.values())
+
+
+# --- Mode hors ligne ---
+def iter_raw_events(path: str):
+    """(mouse_id, zone_idx, event, ts_ms) d'un fichier jour (.csv ou .csv.gz)."""
+    with open_day_text(path) as f:
+        reader = csv.reader(f, delimiter=";")
+        next(reader, None)  # header
+        for row in reader:
+            if len(row) < 4:
+                continue
+            try:
+                yield row[1], int(row[2]), row[3], _ms(datetime.fromisoformat(row[0]))
+            except ValueError:
+                continue
+
+
+def _tail_closed(last: Optional[int], session_gap_ms: int, now_ms: Optional[int]) -> bool:
+    """Fin de journal = fin de session, sauf si le dernier événement date de moins de session_gap_ms avant now_ms."""
+    return last is not None and (now_ms is None or now_ms - last > session_gap_ms)
+
+
+def compact_events(events: Iterable[tuple], merge_gap_ms: int = DEFAULT_MERGE_GAP_MS,
+                   session_gap_ms: int = SESSION_GAP_MS, now_ms: Optional[int] = None) -> List[Visit]:
+    """
+    Visites d'un journal. Comme les autres rejeux, un silence > session_gap_ms ferme les visites
+    ouvertes au dernier événement, de même que la fin du journal (sauf si elle date de moins de
+    session_gap_ms avant now_ms : ces visites restent ouvertes, leave_ms=None).
+    """
+    comp = VisitCompactor(merge_gap_ms)
+    visits: List[Visit] = []
+    last = None
+    for mid, z, ev, ts in events:
+        if last is not None and ts - last > session_gap_ms:
+            visits.extend(comp.close_all(last))
+        visits.extend(comp.feed(mid, z, ev, ts))
+        last = ts
+    visits.extend(comp.close_all(last if _tail_closed(last, session_gap_ms, now_ms) else None))
+    visits.sort(key=lambda v: (v.enter_ms, v.mouse_id))
+    return visits
+
+
+def write_visits(path: str, visits: Iterable[Visit]):
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(VISITS_HEADER)
+        w.writerows(v.to_row() for v in visits)
+    os.replace(tmp, path)
+
+
+def read_visits(path: str) -> List[Visit]:
+    out = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter=";")
+        next(reader, None)  # header
+        for row in reader:
+            if len(row) < 5:
+                continue
+            try:
+                out.append(Visit(row[2], int(row[3]), _ms(datetime.fromisoformat(row[0])),
+                                 _ms(datetime.fromisoformat(row[1])) if row[1] else None, int(row[4])))
+            except ValueError:
+                continue
+    return out
+
+
+def compact_logs(dirpath: str = "logs", merge_gap_ms: int = DEFAULT_MERGE_GAP_MS,
+                 verify: bool = True, skip_days: Iterable[str] = (), now_ms: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Compacte chaque fichier jour de dirpath dans dirpath/visits/<jour>.csv (sauf skip_days).
+    Les visites ouvertes en fin de jour sont fermées au dernier événement du jour, sauf pour un
+    journal récent par rapport à now_ms (voir compact_events).
+    Retourne (lignes brutes, visites). Lève ValueError si la vérification échoue.
+    """
+    skip_days = set(skip_days)
+    vdir = os.path.join(dirpath, VISITS_DIRNAME)
+    os.makedirs(vdir, exist_ok=True)
+    n_rows = n_visits = 0
+    for day, fnames in group_by_day(list_day_files(dirpath)):
+        if day in skip_days:
+            continue
+        # archive + .csv tardif éventuel : un seul fichier visits/ pour le jour
+        events = [ev for fname in fnames for ev in iter_raw_events(os.path.join(dirpath, fname))]
+        visits = compact_events(events, merge_gap_ms, now_ms=now_ms)
+        if verify:
+            ok, errors = verify_compaction(events, visits, merge_gap_ms, now_ms=now_ms)
+            if not ok:
+                raise ValueError(f"Compaction incohérente pour {day}: {errors[:3]}")
+        write_visits(os.path.join(vdir, day + ".csv"), visits)
+        n_rows += len(events)
+        n_visits += len(visits)
+    return n_rows, n_visits
+
+
+# --- Vérification ---
+def occupancy_timeline(events: Iterable[tuple], merge_gap_ms: int = 0, session_gap_ms: int = SESSION_GAP_MS,
+                       now_ms: Optional[int] = None) -> Dict[Tuple[str, int], List[list]]:
+    """
+    Rejoue le journal brut : intervalles [début, fin] d'occupation par (souris, zone),
+    un trou <= merge_gap_ms entre deux présences consécutives dans la même zone étant refermé.
+    Sessions comme compact_events ; fin=None : encore présent en fin de journal récent.
+    """
+    present: Dict[str, Tuple[int, int]] = {}  # souris -> (zone, début)
+    last: Dict[str, Tuple[int, list]] = {}    # souris -> (zone, dernier intervalle fermé)
+    spans: Dict[Tuple[str, int], List[list]] = {}
+
+    def close(mid, z, t0, t1):
+        prev = last.get(mid)
+        if prev is not None and prev[0] == z and t0 - prev[1][1] <= merge_gap_ms:
+            prev[1][1] = t1
+            return
+        span = [t0, t1]
+        spans.setdefault((mid, z), []).append(span)
+        last[mid] = (z, span)
+
+    last_ts = None
+    for mid, z, ev, ts in events:
+        if last_ts is not None and ts - last_ts > session_gap_ms:
+            for m, (zp, t0) in present.items():
+                close(m, zp, t0, last_ts)
+            present.clear()
+        last_ts = ts
+        cur = present.get(mid)
+        if ev == "leave":
+            if cur is not None:
+                close(mid, cur[0], cur[1], ts)
+                del present[mid]
+        elif cur is None:
+            present[mid] = (z, ts)
+        elif cur[0] != z:
+            close(mid, cur[0], cur[1], ts)
+            present[mid] = (z, ts)
+    end = last_ts if _tail_closed(last_ts, session_gap_ms, now_ms) else None
+    for mid, (z, t0) in present.items():
+        close(mid, z, t0, end)
+    return spans
+
+
+def verify_compaction(events: List[tuple], visits: List[Visit], merge_gap_ms: int = DEFAULT_MERGE_GAP_MS,
+                      session_gap_ms: int = SESSION_GAP_MS, now_ms: Optional[int] = None) -> Tuple[bool, List[str]]:
+    """Vérifie que les visites reproduisent la chronologie d'occupation du journal brut."""
+    expected = occupancy_timeline(events, merge_gap_ms, session_gap_ms, now_ms)
+    got: Dict[Tuple[str, int], List[list]] = {}
+    for v in sorted(visits, key=lambda v: v.enter_ms):
+        got.setdefault((v.mouse_id, v.zone_idx), []).append([v.enter_ms, v.leave_ms])
+    errors = []
+    for key in set(expected) | set(got):
+        if expected.get(key, []) != got.get(key, []):
+            errors.append(f"{key}: attendu {expected.get(key, [])[:2]}…, obtenu {got.get(key, [])[:2]}…")
+    return not errors, errors
+
+
+if __name__ == "__main__":
+    import sys
+    d = sys.argv[1] if len(sys.argv) > 1 else "logs"
+    rows, visits = compact_logs(d)
+    print(f"{rows} lignes -> {visits} visites ({rows / max(1, visits):.1f}x)")
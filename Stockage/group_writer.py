@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+import csv, os
+import io
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+APP_LOGGER_NAME = "app"
+
+DURABILITY_FLUSH = "flush"              # flush() Python seulement (cache OS)
+DURABILITY_FSYNC_BATCH = "fsync_batch"  # fsync après chaque lot
+DURABILITY_FSYNC_CLOSE = "fsync_close"  # fsync uniquement à la fermeture / rollover
+DURABILITY_MODES = (DURABILITY_FLUSH, DURABILITY_FSYNC_BATCH, DURABILITY_FSYNC_CLOSE)
+
+
+def encode_rows(rows: Sequence[Sequence], delimiter: str = ";") -> List[bytes]:
+    """Encode chaque ligne CSV séparément (octets exacts, pour connaître les offsets)."""
+    buf = io.StringIO()
+    w = csv.writer(buf, delimiter=delimiter)
+    out = []
+    for row in rows:
+        buf.seek(0); buf.truncate()
+        w.writerow(row)
+        out.append(buf.getvalue().encode("utf-8"))
+    return out
+
+
+def append_rows(f, rows: Sequence[Sequence], header: Sequence[str], delimiter: str = ";") -> List[tuple]:
+    """
+    Ajoute rows à la fin du fichier binaire f (en-tête si vide) en un seul write.
+    Retourne [(offset, fin, row), ...] pour chaque ligne écrite.
+    """
+    pos = f.seek(0, os.SEEK_END)
+    chunks = []
+    if pos == 0:
+        h = encode_rows([header], delimiter)[0]
+        chunks.append(h)
+        pos = len(h)
+    written = []
+    for row, data in zip(rows, encode_rows(rows, delimiter)):
+        chunks.append(data)
+        written.append((pos, pos + len(data), row))
+        pos += len(data)
+    f.write(b"".join(chunks))
+    return written
+
+
+class _FlushRequest:
+    __slots__ = ("done", "release")
+
+    def __init__(self, release: bool = False):
+        self.done = threading.Event()
+        self.release = release
+
+
+class GroupCommitWriter:
+    """
+    Écrivain CSV en arrière-plan (group commit) :
+    - add_event() ne fait qu'empiler la ligne dans une file mémoire ;
+    - un thread dédié regroupe les lignes et fait un seul append par intervalle ;
+    - un seul handle reste ouvert par fichier jour (rollover quand le jour change).
+    format_row(row) est appliqué aux lignes dans le thread d'écriture.
+    on_written(fpath, [(offset, fin, row), ...]) est appelé (thread d'écriture) après chaque lot.
+    """
+
+    def __init__(self, header: Sequence[str], flush_interval: float = 0.6,
+                 durability: str = DURABILITY_FLUSH, delimiter: str = ";", logger=None,
+                 on_written=None, format_row=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability inconnue: {durability!r} (attendu: {', '.join(DURABILITY_MODES)})")
+        self._header = list(header)
+        self._interval = max(0.0, float(flush_interval))
+        self._durability = durability
+        self._delimiter = delimiter
+        self._on_written = on_written
+        self._format_row = format_row  # mise en forme des lignes, hors du thread producteur
+        self.logger = logger or logging.getLogger(APP_LOGGER_NAME)
+
+        self._q = queue.Queue()
+        self._handles: Dict[str, object] = {}  # fpath -> fichier ouvert
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="HistoryWriter", daemon=True)
+        self._thread.start()
+
+    # --- API producteur (thread GUI / domaine) ---
+    def submit(self, fpath: str, row: Sequence):
+        if self._closed:
+            raise RuntimeError("GroupCommitWriter fermé")
+        self._q.put((fpath, (row,)))
+
+    def submit_many(self, fpath: str, rows: Sequence[Sequence]):
+        """Plusieurs lignes du même fichier jour en une seule mise en file."""
+        if self._closed:
+            raise RuntimeError("GroupCommitWriter fermé")
+        if rows:
+            self._q.put((fpath, rows))
+
+    def flush(self, timeout: Optional[float] = None, release: bool = False) -> bool:
+        """
+        Force l'écriture de tout ce qui est en file ; bloque jusqu'à ce que ce soit fait.
+        release=True ferme aussi les handles (ex. avant suppression des fichiers sous Windows).
+        """
+        if self._closed or not self._thread.is_alive():
+            return True
+        req = _FlushRequest(release)
+        self._q.put(req)
+        return req.done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(None)
+        self._thread.join(timeout)
+
+    # --- Thread d'écriture ---
+    def _run(self):
+        stop = False
+        while not stop:
+            batch: List[tuple] = []
+            waiters: List[_FlushRequest] = []
+            try:
+                item = self._q.get()
+            except Exception:
+                continue
+            deadline = time.monotonic() + self._interval
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, _FlushRequest):
+                    waiters.append(item)
+                    break  # flush() demandé : on écrit tout de suite
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if not stop:
+                # Ramasse ce qui est déjà en file sans attendre (y compris un éventuel arrêt)
+                while True:
+                    try:
+                        item = self._q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    if isinstance(item, _FlushRequest):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+            self._write_batch(batch)
+            if any(w.release for w in waiters):
+                self._close_handles()
+            for w in waiters:
+                w.done.set()
+        self._close_handles()
+
+    def _write_batch(self, batch: List[tuple]):
+        if not batch:
+            return
+        by_file: Dict[str, List[Sequence]] = {}
+        for fpath, rows in batch:
+            by_file.setdefault(fpath, []).extend(rows)
+        for fpath, rows in by_file.items():
+            try:
+                if self._format_row is not None:
+                    rows = [self._format_row(r) for r in rows]
+                f = self._handle_for(fpath)
+                written = append_rows(f, rows, self._header, self._delimiter)
+                f.flush()
+                if self._durability == DURABILITY_FSYNC_BATCH:
+                    os.fsync(f.fileno())
+            except Exception as e:
+                self.logger.error(f"Erreur écriture historique ({fpath}): {e}")
+                self._drop_handle(fpath)
+                continue
+            if self._on_written is not None:
+                try:
+                    self._on_written(fpath, written)
+                except Exception as e:
+                    self.logger.error(f"Erreur indexation historique ({fpath}): {e}")
+
+    def _handle_for(self, fpath: str):
+        f = self._handles.get(fpath)
+        if f is not None and not f.closed:
+            return f
+        # Rollover : un nouveau fichier jour ferme les précédents
+        for old in list(self._handles):
+            self._drop_handle(old)
+        f = open(fpath, "ab")
+        self._handles[fpath] = f
+        return f
+
+    def _drop_handle(self, fpath: str):
+        f = self._handles.pop(fpath, None)
+        if f is None:
+            return
+        try:
+            f.flush()
+            if self._durability != DURABILITY_FLUSH:
+                os.fsync(f.fileno())
+        except Exception:
+            pass
+        try:
+            f.close()
+        except Exception:
+            pass
+
+    def _close_handles(self):
+        for fpath in list(self._handles):
+            self._drop_handle(fpath)
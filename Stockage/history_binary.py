@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+HistoryStore binaire : fichiers jour à enregistrements de largeur fixe, lus par numpy.memmap.
+
+Enregistrement (15 octets, little-endian, sans padding) :
+    ts     int64   epoch ms (heure locale naïve, comme HistoryStoreSQLite)
+    mouse  uint32  code du mouse_id (dictionnaire dans mouse_ids.json)
+    zone   uint16  zone_idx (relu en int16 : -1 reste -1)
+    event  uint8   0=enter, 1=stay, 2=leave
+Pas de champ seq : les enregistrements d'un fichier jour sont dans l'ordre d'arrivée, qui suffit à
+départager deux événements de même horodatage (la colonne seq des CSV est ignorée à la conversion).
+
+Conversion depuis/vers le format CSV timestamp;mouse_id;zone_idx;event :
+    python -m Stockage.history_binary to-bin logs logs_bin
+    python -m Stockage.history_binary to-csv logs_bin logs_csv
+"""
+import csv, os
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from Stockage.archive import list_day_files, open_day_text
+from Stockage.history_csv import MouseEvent, CSV_HEADER, ts_to_ms, ms_to_ts, EVENT_NAMES, EVENT_CODES, EV_LEAVE
+from Stockage.scan import EVENT_LABELS_FR
+
+RECORD_DTYPE = np.dtype([("ts", "<i8"), ("mouse", "<u4"), ("zone", "<u2"), ("event", "u1")])
+# Codes du registre partagé (history_csv) : seuls enter/stay/leave (0..2) sont fixes d'une session à l'autre
+BIN_EVENTS = tuple(EVENT_NAMES[:EV_LEAVE + 1])
+DICT_FILENAME = "mouse_ids.json"
+
+
+class HistoryStoreBinary:
+    """Même interface que HistoryStoreCSV ; filtres période/souris vectorisés (masques NumPy)."""
+
+    def __init__(self, dirpath: str = "logs_bin", batch_size: int = 256):
+        self.dir = dirpath
+        os.makedirs(self.dir, exist_ok=True)
+        self._batch_size = max(1, int(batch_size))
+        self._lock = threading.RLock()
+        self._pending: Dict[str, List[tuple]] = {}  # day -> [(ts_ms, code, zone, ev)]
+        self._npending = 0
+        self._ids: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._dict_dirty = False
+        self._load_dict()
+
+    # --- Dictionnaire mouse_id <-> code ---
+    def _load_dict(self):
+        try:
+            with open(os.path.join(self.dir, DICT_FILENAME), "r", encoding="utf-8") as f:
+                self._ids = list(json.load(f))
+        except Exception:
+            self._ids = []
+        self._codes = {mid: i for i, mid in enumerate(self._ids)}
+
+    def _save_dict(self):
+        if not self._dict_dirty:
+            return
+        path = os.path.join(self.dir, DICT_FILENAME)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._ids, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._dict_dirty = False
+
+    def _code_for(self, mouse_id: str) -> int:
+        code = self._codes.get(mouse_id)
+        if code is None:
+            code = self._codes[mouse_id] = len(self._ids)
+            self._ids.append(mouse_id)
+            self._dict_dirty = True
+        return code
+
+    # --- Ecriture ---
+    def _file_for_day(self, day: str) -> str:
+        return os.path.join(self.dir, day + ".bin")
+
+    def add_event(self, mouse_id: str, zone_idx: int, event: Union[str, int], ts: Union[datetime, int, None] = None):
+        self.add_events(((mouse_id, zone_idx, event, ts),))
+
+    def add_events(self, batch: Iterable[tuple]):
+        """Ajout groupé [(mouse_id, zone_idx, event, ts), ...]."""
+        with self._lock:
+            for mouse_id, zone_idx, event, ts in batch:
+                if isinstance(ts, int):
+                    ts_ms, ts = ts, ms_to_ts(ts)
+                else:
+                    ts = ts or datetime.now()
+                    ts_ms = ts_to_ms(ts)
+                ev = event if isinstance(event, int) else EVENT_CODES.get(event)
+                if ev is None or not 0 <= ev <= EV_LEAVE:
+                    raise ValueError(f"événement inconnu: {event!r}")
+                rec = (ts_ms, self._code_for(mouse_id), int(zone_idx) & 0xFFFF, ev)
+                self._pending.setdefault(ts.strftime("%Y-%m-%d"), []).append(rec)
+                self._npending += 1
+            if self._npending >= self._batch_size:
+                self._write_pending()
+
+    def _write_pending(self):
+        # Le dictionnaire d'abord : aucun code sur disque sans son mouse_id
+        self._save_dict()
+        for day, recs in self._pending.items():
+            arr = np.array(recs, dtype=RECORD_DTYPE)
+            with open(self._file_for_day(day), "ab") as f:
+                f.write(arr.tobytes())
+        self._pending.clear()
+        self._npending = 0
+
+    def flush(self, release: bool = False):
+        with self._lock:
+            self._write_pending()
+
+    def close(self):
+        self.flush()
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._npending = 0
+            for fname in os.listdir(self.dir):
+                if fname.endswith(".bin") or fname == DICT_FILENAME:
+                    try: os.remove(os.path.join(self.dir, fname))
+                    except OSError: pass
+            self._ids, self._codes = [], {}
+
+    # --- Lecture ---
+    def _day_files(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        d0 = start.strftime("%Y-%m-%d") if start else None
+        d1 = end.strftime("%Y-%m-%d") if end else None
+        out = []
+        for fname in sorted(os.listdir(self.dir)):
+            if not fname.endswith(".bin"):
+                continue
+            day = fname[:-4]
+            if (d0 and day < d0) or (d1 and day > d1):
+                continue
+            out.append(os.path.join(self.dir, fname))
+        return out
+
+    @staticmethod
+    def _map(path: str):
+        n = os.path.getsize(path) // RECORD_DTYPE.itemsize  # ignore un éventuel enregistrement tronqué
+        if n == 0:
+            return None
+        return np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(n,))
+
+    def _select(self, start=None, end=None, mouse_ids=None):
+        """Itère sur les sous-tableaux filtrés (un par fichier jour)."""
+        self.flush()
+        codes = None
+        if mouse_ids is not None:
+            codes = np.array([self._codes[m] for m in mouse_ids if m in self._codes], dtype=np.uint32)
+            if codes.size == 0:
+                return
+        t0 = ts_to_ms(start) if start is not None else None
+        t1 = ts_to_ms(end) if end is not None else None
+        for path in self._day_files(start, end):
+            arr = self._map(path)
+            if arr is None:
+                continue
+            mask = np.ones(arr.shape[0], dtype=bool)
+            if codes is not None:
+                mask &= np.isin(arr["mouse"], codes)
+            if t0 is not None:
+                mask &= arr["ts"] >= t0
+            if t1 is not None:
+                mask &= arr["ts"] <= t1
+            sel = arr[mask]
+            if sel.size:
+                yield np.array(sel)  # copie : libère le mapping du fichier
+
+    def _to_events(self, sel) -> Iterator[MouseEvent]:
+        zones = sel["zone"].astype(np.int16)
+        for ts, code, z, ev in zip(sel["ts"].tolist(), sel["mouse"].tolist(), zones.tolist(), sel["event"].tolist()):
+            yield MouseEvent(ts, self._ids[code], z, ev)  # codes 0/1/2 identiques à history_csv
+
+    def iter_events(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    mouse_ids: Optional[Iterable[str]] = None) -> Iterator[MouseEvent]:
+        for sel in self._select(start, end, list(mouse_ids) if mouse_ids else None):
+            yield from self._to_events(sel)
+
+    def get_history(self, mouse_id: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> List[MouseEvent]:
+        return list(self.iter_events(start, end, [mouse_id]))
+
+    def get_mouse_ids(self) -> List[str]:
+        with self._lock:
+            return sorted(self._ids)
+
+    def preload_ids_from_disk(self):
+        return self.get_mouse_ids()
+
+    def export_csv(self, path: str, mouse_ids: Optional[Iterable[str]] = None,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None):
+        labels = [EVENT_LABELS_FR.get(n, n) for n in BIN_EVENTS]
+        with open(path, "w", newline="", encoding="utf-8-sig") as out:
+            w = csv.writer(out, delimiter=";")
+            w.writerow(CSV_HEADER)
+            for sel in self._select(start, end, list(mouse_ids) if mouse_ids else None):
+                zones = sel["zone"].astype(np.int16) + 1
+                w.writerows(
+                    (ms_to_ts(ts).isoformat(timespec="milliseconds"), self._ids[code], z, labels[ev])
+                    for ts, code, z, ev in zip(sel["ts"].tolist(), sel["mouse"].tolist(),
+                                               zones.tolist(), sel["event"].tolist()))
+
+
+# --- Outils de conversion CSV <-> binaire ---
+def csv_to_binary(csv_dir: str, bin_dir: str) -> int:
+    """
+    Convertit les fichiers jour CSV et leurs archives .csv.gz (timestamp;mouse_id;zone_idx;event) ;
+    retourne le nb d'événements.
+    """
+    store = HistoryStoreBinary(bin_dir, batch_size=10000)
+    n = 0
+    for fname in list_day_files(csv_dir):
+        with open_day_text(os.path.join(csv_dir, fname)) as f:
+            reader = csv.reader(f, delimiter=";")
+            next(reader, None)  # header
+            for row in reader:
+                if len(row) < 4 or row[3] not in BIN_EVENTS:
+                    continue
+                try:
+                    store.add_event(row[1], int(row[2]), row[3], datetime.fromisoformat(row[0]))
+                except ValueError:
+                    continue
+                n += 1
+    store.close()
+    return n
+
+
+def binary_to_csv(bin_dir: str, csv_dir: str) -> int:
+    """Reconstitue les fichiers jour CSV à partir d'un dossier binaire ; retourne le nb d'événements."""
+    store = HistoryStoreBinary(bin_dir)
+    os.makedirs(csv_dir, exist_ok=True)
+    n = 0
+    for path in store._day_files():
+        day = os.path.basename(path)[:-4]
+        arr = store._map(path)
+        if arr is None:
+            continue
+        with open(os.path.join(csv_dir, day + ".csv"), "w", newline="", encoding="utf-8") as out:
+            w = csv.writer(out, delimiter=";")
+            w.writerow(CSV_HEADER)
+            for ev in store._to_events(np.array(arr)):
+                w.writerow([ev.ts.isoformat(timespec="milliseconds"), ev.mouse_id, ev.zone_idx, ev.event])
+                n += 1
+    return n
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-bin", "to-csv"):
+        print("usage: python -m Stockage.history_binary (to-bin|to-csv) <source> <destination>")
+        sys.exit(2)
+    fn = csv_to_binary if sys.argv[1] == "to-bin" else binary_to_csv
+    print(f"{fn(sys.argv[2], sys.argv[3])} événements convertis.")
@@ -1,92 +1,603 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass
-from typing import List, Iterable, Optional, Dict
-from datetime import datetime
+from typing import List, Iterable, Iterator, Optional, Dict, Union
+from datetime import datetime, timedelta
 import csv, os
-import io
+import logging
+import shutil
+import sys
+import threading
+import time
+
+from Stockage.group_writer import GroupCommitWriter, DURABILITY_FLUSH, append_rows, encode_rows
+from Stockage.id_catalog import IdCatalog
+from Stockage.offset_index import OffsetIndex, INDEX_DIRNAME
+from Stockage.archive import (LogArchiver, ARCHIVE_SUFFIX, list_day_files, day_of, group_by_day, is_day_file,
+                              open_day_text)
+from Stockage.cache import EventCache
+from Stockage.scan import ScanEngine, iter_day_rows, format_export_row
+from Stockage.interval_index import ZoneIntervalIndex
+from Stockage.compaction import (VisitCompactor, Visit, VISITS_DIRNAME, VISITS_HEADER, DEFAULT_MERGE_GAP_MS,
+                                 compact_events, compact_logs, iter_raw_events, read_visits, write_visits,
+                                 SESSION_GAP_MS)
+
+CSV_HEADER = ["timestamp", "mouse_id", "zone_idx", "event"]
+# Fichiers jour : + numéro de séquence de la session (ordre exact à horodatage égal).
+# Les anciens fichiers (4 colonnes, horodatage à la seconde) restent lisibles tels quels.
+DAY_HEADER = CSV_HEADER + ["seq"]
+
+WRITER_SYNC = "sync"              # un open/append/close par événement (historique)
+WRITER_BACKGROUND = "background"  # group commit via un thread dédié
+
+_EXPORT_BATCH = 1000   # lignes par writerows() à l'export
+
+# Codes compacts des événements (les libellés inconnus lus sur disque sont ajoutés à la volée)
+EV_ENTER, EV_STAY, EV_LEAVE = 0, 1, 2
+EVENT_NAMES = ["enter", "stay", "leave"]
+EVENT_CODES = {name: i for i, name in enumerate(EVENT_NAMES)}
+_EVENT_LOCK = threading.Lock()  # registre unique, complété depuis les threads domaine / GUI / lecture
+
+
+def event_code(event: Union[str, int]) -> int:
+    if isinstance(event, int):
+        return event
+    code = EVENT_CODES.get(event)
+    if code is None:
+        with _EVENT_LOCK:
+            code = EVENT_CODES.get(event)
+            if code is None:
+                EVENT_NAMES.append(event)  # le nom avant le code : tout code publié se résout
+                code = EVENT_CODES[event] = len(EVENT_NAMES) - 1
+    return code
+
+
+def ts_to_ms(ts: datetime) -> int:
+    """datetime naïf (heure locale) -> epoch ms."""
+    return int(round(ts.timestamp() * 1000))
+
+
+def ms_to_ts(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000.0)
 
-EVENT_LABELS_FR = {"enter": "Entree", "stay": "Presence", "leave": "Sortie"}
 
-@dataclass
 class MouseEvent:
-    ts: datetime
-    mouse_id: str
-    zone_idx: int
-    event: str  # enter | stay | leave
+    """
+    Evénement compact : epoch ms entier, mouse_id interné, code d'événement.
+    ts (datetime) et event (libellé) ne sont reconstruits qu'à la lecture (affichage/export).
+    """
+    __slots__ = ("ts_ms", "mouse_id", "zone_idx", "code", "seq")
+
+    def __init__(self, ts: Union[datetime, int], mouse_id: str, zone_idx: int, event: Union[str, int],
+                 seq: int = 0):
+        self.ts_ms = ts if isinstance(ts, int) else ts_to_ms(ts)
+        self.mouse_id = sys.intern(mouse_id)
+        self.zone_idx = zone_idx
+        self.code = event_code(event)
+        self.seq = seq  # 0 = inconnu (fichiers antérieurs)
+
+    @property
+    def ts(self) -> datetime:
+        return ms_to_ts(self.ts_ms)
+
+    @property
+    def event(self) -> str:  # enter | stay | leave
+        return EVENT_NAMES[self.code]
+
+    def __eq__(self, other):
+        if not isinstance(other, MouseEvent):
+            return NotImplemented
+        return (self.ts_ms, self.mouse_id, self.zone_idx, self.code) == \
+               (other.ts_ms, other.mouse_id, other.zone_idx, other.code)
+
+    def __repr__(self):
+        return (f"MouseEvent(ts={self.ts.isoformat(timespec='milliseconds')}, mouse_id={self.mouse_id!r}, "
+                f"zone_idx={self.zone_idx}, event={self.event!r})")
+
+def _format_row(row: list) -> list:
+    """[ts_ms, mouse_id, zone_idx, event, seq] -> ligne CSV (horodatage à la milliseconde)."""
+    return [ms_to_ts(row[0]).isoformat(timespec="milliseconds")] + row[1:]
+
+
+def event_from_row(row: List[str], event: Optional[str] = None) -> MouseEvent:
+    """Ligne disque -> MouseEvent ; accepte les deux formats (secondes sans seq / ms + seq)."""
+    seq = int(row[4]) if len(row) > 4 and row[4] else 0
+    return MouseEvent(datetime.fromisoformat(row[0]), row[1], int(row[2]), row[3] if event is None else event, seq)
+
 
 class HistoryStoreCSV:
-    def __init__(self, dirpath: str = "logs"):
+    def __init__(self, dirpath: str = "logs", writer: str = WRITER_SYNC,
+                 flush_interval: float = 0.6, durability: str = DURABILITY_FLUSH,
+                 archive_after_days: Optional[int] = None, scan_workers: int = 1,
+                 cache_per_mouse: int = 2000, cache_max_events: int = 200_000,
+                 visits_merge_gap_ms: Optional[int] = None):
         self.dir = dirpath
         os.makedirs(self.dir, exist_ok=True)
-        self._mem: Dict[str, List[MouseEvent]] = {}
+        self._ids = set()  # mouse_id vus pendant la session
+        self._lock = threading.RLock()  # écritures (thread domaine) / lectures (thread GUI)
+        self._cache = EventCache(cache_per_mouse, cache_max_events)
+        self._catalog = IdCatalog(self.dir)
+        self._index = OffsetIndex(self.dir)
+        self._engine = ScanEngine(scan_workers)
+        if writer == WRITER_BACKGROUND:
+            self._writer = GroupCommitWriter(DAY_HEADER, flush_interval=flush_interval, durability=durability,
+                                             on_written=self._on_rows_written, format_row=_format_row)
+        elif writer == WRITER_SYNC:
+            self._writer = None
+        else:
+            raise ValueError(f"writer inconnu: {writer!r}")
+        self._day_lo = self._day_hi = 0  # bornes [ms) du fichier jour courant
+        self._day_path = ""
+        self._header_checked = set()  # fichiers jour dont l'en-tête a été vérifié pendant la session
+        self._archiver = None
+        # Compaction en ligne en visites (logs/visits/<jour>.csv) ; None = désactivée
+        self._compactor = VisitCompactor(visits_merge_gap_ms) if visits_merge_gap_ms is not None else None
+        self._visits_expire_ms = 0
+        if self._compactor is not None:
+            self._resume_visits()
+        self._intervals = None  # index zone -> intervalles de présence, construit à la 1re requête
+        self._seq = 0  # séquence monotone des événements de la session
+        if archive_after_days is not None:
+            self._archiver = LogArchiver(self.dir, archive_after_days, on_archived=self._on_archived)
+            self._archiver.start()
 
     def _file_for(self, dt: datetime) -> str:
         return os.path.join(self.dir, dt.strftime("%Y-%m-%d") + ".csv")
 
-    def add_event(self, mouse_id: str, zone_idx: int, event: str, ts: Optional[datetime] = None):
-        ts = ts or datetime.now()
-        fpath = self._file_for(ts)
-        newfile = not os.path.exists(fpath)
-        with open(fpath, "a", newline="", encoding="utf-8") as f:
-            w = csv.writer(f, delimiter=";")
-            if newfile:
-                w.writerow(["timestamp", "mouse_id", "zone_idx", "event"])
-            w.writerow([ts.isoformat(timespec="seconds"), mouse_id, zone_idx, event])
-        self._mem.setdefault(mouse_id, []).append(MouseEvent(ts, mouse_id, zone_idx, event))
+    def _file_for_ms(self, ms: int) -> str:
+        if not (self._day_lo <= ms < self._day_hi):
+            day0 = ms_to_ts(ms).replace(hour=0, minute=0, second=0, microsecond=0)
+            self._day_lo, self._day_hi = ts_to_ms(day0), ts_to_ms(day0 + timedelta(days=1))
+            self._day_path = self._file_for(day0)
+            if self._day_path not in self._header_checked:
+                self._header_checked.add(self._day_path)
+                self._upgrade_header(self._day_path)
+        return self._day_path
 
-    def get_mouse_ids(self) -> List[str]:
-        return sorted(self._mem.keys())
+    def _upgrade_header(self, path: str):
+        """
+        Fichier jour commencé par une version précédente (en-tête sans seq) : l'en-tête est réécrit
+        avant d'y ajouter des lignes à 5 colonnes. Les lignes existantes restent telles quelles.
+        """
+        new = encode_rows([DAY_HEADER])[0]
+        try:
+            with open(path, "rb") as f:
+                first = f.readline()
+                if not first or first == new or not first.lstrip(b"\xef\xbb\xbf").startswith(b"timestamp"):
+                    return
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as out:
+                    out.write(new)
+                    shutil.copyfileobj(f, out, 1 << 16)
+            os.replace(tmp, path)
+        except FileNotFoundError:
+            return  # nouveau fichier : il sera créé avec DAY_HEADER
+        except OSError as e:
+            logging.getLogger("app").error(f"Mise à jour de l'en-tête impossible ({path}): {e}")
+            return
+        # offsets décalés : index et catalogue de ce fichier sont à reconstruire
+        self._forget_offsets(path)
+        self._catalog.forget(os.path.basename(path))
+        self._catalog.save()
 
-    def get_history(self, mouse_id: str) -> List[MouseEvent]:
-        return list(self._mem.get(mouse_id, []))
+    def add_event(self, mouse_id: str, zone_idx: int, event: Union[str, int],
+                  ts: Union[datetime, int, None] = None):
+        """ts : datetime ou epoch ms (int). La mise en forme ISO se fait à l'écriture."""
+        self.add_events(((mouse_id, zone_idx, event, ts),))
 
-    def export_csv(self, path: str, mouse_ids: Optional[Iterable[str]] = None):
-        with open(path, "w", newline="", encoding="utf-8-sig") as out:
-            w = csv.writer(out, delimiter=";")
-            w.writerow(["timestamp", "mouse_id", "zone_idx", "event"])
-            for fname in sorted(os.listdir(self.dir)):
-                if not fname.endswith(".csv"):
+    def add_events(self, batch: Iterable[tuple]):
+        """
+        Ajout groupé [(mouse_id, zone_idx, event, ts), ...] (ex. tous les changements d'un flush) :
+        une seule mise en file (ou un seul append) par fichier jour.
+        """
+        with self._lock:
+            self._add_events(batch)
+
+    def _add_events(self, batch: Iterable[tuple]):
+        now_ms = None
+        by_file: Dict[str, list] = {}
+        visits: List[Visit] = []
+        for mouse_id, zone_idx, event, ts in batch:
+            if ts is None:
+                ts = now_ms = now_ms or int(time.time() * 1000)
+            self._seq += 1
+            ev = MouseEvent(ts, mouse_id, zone_idx, event, self._seq)
+            by_file.setdefault(self._file_for_ms(ev.ts_ms), []).append(
+                [ev.ts_ms, ev.mouse_id, zone_idx, ev.event, ev.seq])
+            self._ids.add(ev.mouse_id)
+            self._cache.append(ev)
+            if self._intervals is not None:
+                self._intervals.feed(ev.mouse_id, zone_idx, ev.event, ev.ts_ms)
+            if self._compactor is not None:
+                visits += self._compactor.feed(ev.mouse_id, zone_idx, ev.event, ev.ts_ms)
+                if ev.ts_ms >= self._visits_expire_ms:  # sorties en suspens validées au plus 1x/s
+                    visits += self._compactor.expire(ev.ts_ms)
+                    self._visits_expire_ms = ev.ts_ms + 1000
+        for fpath, rows in by_file.items():
+            if self._writer is not None:
+                self._writer.submit_many(fpath, rows)  # formaté dans le thread d'écriture
+            else:
+                with open(fpath, "ab") as f:
+                    written = append_rows(f, [_format_row(r) for r in rows], DAY_HEADER)
+                self._on_rows_written(fpath, written)
+        if visits:
+            self._write_visits(visits)
+
+    def _resume_visits(self):
+        """
+        Démarrage : le dernier jour du journal est recompacté pour réécrire son visits/<jour>.csv
+        (visites terminées seulement) et reprendre les visites encore ouvertes là où elles en étaient.
+        Si ce journal date de plus de SESSION_GAP_MS, la session est finie : tout est fermé au dernier événement.
+        """
+        groups = group_by_day(list_day_files(self.dir))
+        if not groups:
+            return
+        day, fnames = groups[-1]
+        comp = self._compactor
+        done: List[Visit] = []
+        last = None
+        for fname in fnames:
+            for mid, z, ev, ts in iter_raw_events(os.path.join(self.dir, fname)):
+                if last is not None and ts - last > SESSION_GAP_MS:
+                    done += comp.close_all(last)
+                done += comp.feed(mid, z, ev, ts)
+                last = ts
+        if last is not None and int(time.time() * 1000) - last > SESSION_GAP_MS:
+            done += comp.close_all(last)
+        vdir = os.path.join(self.dir, VISITS_DIRNAME)
+        os.makedirs(vdir, exist_ok=True)
+        write_visits(os.path.join(vdir, day + ".csv"), sorted(done, key=lambda v: (v.enter_ms, v.mouse_id)))
+
+    def _compact_day(self, fulls: List[str]) -> List[Visit]:
+        """Visites d'un jour compactées depuis son journal (sans celles que tient la compaction en ligne)."""
+        gap = self._compactor.merge_gap_ms if self._compactor is not None else DEFAULT_MERGE_GAP_MS
+        return self._drop_held(compact_events((ev for f in fulls for ev in iter_raw_events(f)), gap,
+                                              now_ms=int(time.time() * 1000)))
+
+    def _drop_held(self, visits: List[Visit]) -> List[Visit]:
+        """
+        Retire les visites ouvertes ou en suspens dans la compaction en ligne : elles sont rendues par
+        open_visits() puis écrites à leur sortie (pas de doublon « en cours »).
+        """
+        if self._compactor is None:
+            return visits
+        with self._lock:
+            held = {(v.mouse_id, v.enter_ms) for v in self._compactor.open_visits()}
+        return [v for v in visits if v.leave_ms is not None and (v.mouse_id, v.enter_ms) not in held]
+
+    def _visits_file_for_ms(self, ms: int) -> str:
+        return os.path.join(self.dir, VISITS_DIRNAME, ms_to_ts(ms).strftime("%Y-%m-%d") + ".csv")
+
+    def _write_visits(self, visits: List[Visit]):
+        by_file: Dict[str, list] = {}
+        for v in visits:  # une visite est rangée au jour de son entrée
+            by_file.setdefault(self._visits_file_for_ms(v.enter_ms), []).append(v)
+        os.makedirs(os.path.join(self.dir, VISITS_DIRNAME), exist_ok=True)
+        for fpath, day_visits in by_file.items():
+            if not os.path.exists(fpath):
+                # 1re visite d'un jour sans fichier visits/ (jour passé, événement tardif, minuit) :
+                # le fichier est créé complet depuis le journal du jour, qui contient déjà ces visites
+                day = os.path.basename(fpath)[:-len(".csv")]
+                fulls = [p for p in (os.path.join(self.dir, day + ARCHIVE_SUFFIX), os.path.join(self.dir, day + ".csv"))
+                         if os.path.exists(p)]
+                if fulls:
+                    self.flush()
+                    write_visits(fpath, self._compact_day(fulls))
                     continue
-                full = os.path.join(self.dir, fname)
-                with open(full, "r", encoding="utf-8-sig") as f:
-                    data = f.read()
-                try:
-                    dialect = csv.Sniffer().sniff(data, delimiters=";,")
-                except Exception:
-                    class _D: delimiter = ";"
-                    dialect = _D()
-                reader = csv.reader(io.StringIO(data), dialect)
-                header = next(reader, None)  # skip header
-                for row in reader:
-                    if not row:
-                        continue
-                    if mouse_ids and row[1] not in mouse_ids:
+            with open(fpath, "ab") as f:
+                append_rows(f, [v.to_row() for v in day_visits], VISITS_HEADER)
+
+    def _on_rows_written(self, fpath: str, written):
+        for offset, end, row in written:
+            self._index.note_append(fpath, offset, row[1], end, row[0])
+
+    def flush(self, release: bool = False):
+        """Garantit que les événements en file sont écrits sur disque (mode background)."""
+        if self._writer is not None:
+            self._writer.flush(release=release)
+
+    def _forget_offsets(self, csv_path: str):
+        self._index.forget(csv_path)
+        try: os.remove(os.path.join(self.dir, INDEX_DIRNAME, os.path.basename(csv_path) + ".json"))
+        except OSError: pass
+
+    def _on_archived(self, csv_path: str, gz_path: str):
+        # L'index d'offsets ne s'applique qu'aux .csv (un .csv.gz est relu en flux)
+        self._forget_offsets(csv_path)
+
+    def close(self):
+        if self._archiver is not None:
+            self._archiver.stop()
+            self._archiver = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        with self._lock:
+            if self._compactor is not None:
+                # seules les sorties en suspens sont définitives ; les visites en cours seront reprises
+                # depuis le fichier jour au prochain démarrage (_resume_visits)
+                left = [v for v in self._compactor.close_all() if v.leave_ms is not None]
+                if left:
+                    self._write_visits(left)
+        self._index.save()
+
+    def clear(self):
+        """Supprime les fichiers jour (.csv et .csv.gz) et les index associés."""
+        self.flush(release=True)
+        for fname in os.listdir(self.dir):
+            if is_day_file(fname):
+                try: os.remove(os.path.join(self.dir, fname))
+                except OSError: pass
+        for sub in (INDEX_DIRNAME, VISITS_DIRNAME):
+            sub_dir = os.path.join(self.dir, sub)
+            if os.path.isdir(sub_dir):
+                for fname in os.listdir(sub_dir):
+                    try: os.remove(os.path.join(sub_dir, fname))
+                    except OSError: pass
+        self._index.forget()
+        with self._lock:
+            if self._compactor is not None:
+                self._compactor = VisitCompactor(self._compactor.merge_gap_ms)
+            self._ids.clear()
+            self._intervals = None
+        self._cache.clear()
+
+    def get_mouse_ids(self) -> List[str]:
+        with self._lock:
+            return sorted(self._ids)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Compteurs du cache mémoire (hits/misses, évictions, taille) pour le dimensionner."""
+        return self._cache.stats()
+
+    def get_history(self, mouse_id: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> List[MouseEvent]:
+        """
+        Historique multi-jours : servi par le cache mémoire si la période y est entièrement,
+        sinon lu sur disque par seek direct sur les lignes de la souris. Un historique complet
+        (sans start ni end) assez court amorce le cache pour les appels suivants.
+        """
+        cached = self._cache.get(mouse_id, start, end)
+        if cached is not None:
+            return cached
+        appends = self._cache.appends(mouse_id)
+        self.flush()
+        out: List[MouseEvent] = []
+        for full in self._day_files(start, end):
+            if full.endswith(ARCHIVE_SUFFIX):
+                out.extend(self._scan_history(full, mouse_id, start, end))
+                continue
+            offsets = self._index.offsets_for(full, mouse_id)
+            if not offsets:
+                continue
+            with open(full, "rb") as f:
+                for off in offsets:
+                    f.seek(off)
+                    line = f.readline().decode("utf-8", errors="ignore").rstrip("\r\n")
+                    row = line.split(";")
+                    if len(row) < 4 or row[1] != mouse_id:
                         continue
-                    ev_en = row[3] if len(row) > 3 else ""
-                    ev_fr = EVENT_LABELS_FR.get(ev_en, ev_en)
                     try:
-                        z1 = str(int(row[2]) + 1)
-                    except Exception:
-                        z1 = row[2]  # au cas où ce ne serait pas un entier
-                    w.writerow([row[0], row[1], z1, ev_fr])
+                        ev = event_from_row(row)
+                    except ValueError:
+                        continue
+                    if (start is not None and ev.ts < start) or (end is not None and ev.ts > end):
+                        continue
+                    out.append(ev)
+        if start is None and end is None:
+            # historique complet : les ouvertures suivantes (dialogue Historique) sont servies en mémoire
+            self._cache.seed(mouse_id, out, appends)
+        return out
 
+    def _scan_history(self, full: str, mouse_id: str, start: Optional[datetime],
+                      end: Optional[datetime]) -> List[MouseEvent]:
+        """Relecture en flux d'un fichier archivé (.csv.gz), sans index d'offsets."""
+        out = []
+        with open_day_text(full) as f:
+            reader = csv.reader(f, delimiter=";")
+            next(reader, None)  # header
+            for row in reader:
+                if len(row) < 4 or row[1] != mouse_id:
+                    continue
+                try:
+                    ev = event_from_row(row)
+                except ValueError:
+                    continue
+                if (start is not None and ev.ts < start) or (end is not None and ev.ts > end):
+                    continue
+                out.append(ev)
+        return out
 
+    def _day_files(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        """Fichiers jour (.csv / .csv.gz) triés ; si start/end sont donnés, seuls les jours concernés."""
+        d0 = start.strftime("%Y-%m-%d") if start else None
+        d1 = end.strftime("%Y-%m-%d") if end else None
+        out = []
+        for fname in list_day_files(self.dir):
+            day = day_of(fname)
+            if len(day) == 10 and ((d0 and day < d0) or (d1 and day > d1)):
+                continue
+            out.append(os.path.join(self.dir, fname))
+        return out
 
+    def _iter_day_rows(self, full: str, ids: Optional[set], s0: Optional[str],
+                       s1: Optional[str]) -> Iterator[List[str]]:
+        """
+        Lignes d'un fichier jour dans [s0, s1]. Pour un .csv, démarre au seek fourni par l'index
+        temporel creux et s'arrête dès qu'on dépasse s1 (lignes ajoutées en ordre chronologique).
+        """
+        if full.endswith(ARCHIVE_SUFFIX):
+            yield from iter_day_rows(full, ids, s0, s1)
+            return
+        offset = self._index.seek_offset(full, s0)
+        with open(full, "rb") as f:
+            f.seek(offset)
+            if offset == 0:
+                f.readline()  # header
+            for line in f:
+                row = line.decode("utf-8", errors="ignore").rstrip("\r\n").split(";")
+                if len(row) < 3:
+                    continue
+                if s1 is not None and row[0][:19] > s1:
+                    break
+                if s0 is not None and row[0] < s0:
+                    continue
+                if ids is not None and row[1] not in ids:
+                    continue
+                yield row
+
+    def _iter_rows(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   mouse_ids: Optional[Iterable[str]] = None) -> Iterator[List[str]]:
+        """Lignes brutes [timestamp, mouse_id, zone_idx, event], fichier par fichier, en flux."""
+        self.flush()
+        ids = set(mouse_ids) if mouse_ids else None
+        # Les timestamps ISO se comparent directement en tant que chaînes
+        s0 = start.isoformat(timespec="seconds") if start else None
+        s1 = end.isoformat(timespec="seconds") if end else None
+        for full in self._day_files(start, end):
+            if s0 is None and s1 is None:
+                yield from iter_day_rows(full, ids)
+            else:
+                yield from self._iter_day_rows(full, ids, s0, s1)
+
+    def query(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              mouse_ids: Optional[Iterable[str]] = None, zones: Optional[Iterable[int]] = None,
+              events: Optional[Iterable[Union[str, int]]] = None) -> Iterator[MouseEvent]:
+        """
+        Itérateur paresseux sur les événements de [start, end] (bornes incluses, à la seconde),
+        filtrés par souris, zones (0-based) et types d'événement (libellés ou codes).
+        Seuls les fichiers jour concernés sont ouverts ; dans chacun, la lecture commence
+        par recherche dichotomique sur l'index temporel creux.
+        """
+        zs = {str(int(z)) for z in zones} if zones is not None else None
+        evs = {EVENT_NAMES[e] if isinstance(e, int) else e for e in events} if events is not None else None
+        for row in self._iter_rows(start, end, mouse_ids):
+            if zs is not None and row[2] not in zs:
+                continue
+            ev = row[3] if len(row) > 3 else ""
+            if evs is not None and ev not in evs:
+                continue
+            try:
+                yield event_from_row(row, ev)
+            except ValueError:
+                continue
+
+    def iter_events(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    mouse_ids: Optional[Iterable[str]] = None) -> Iterator[MouseEvent]:
+        """Générateur d'événements sur disque (mémoire constante), filtrés par période et souris."""
+        return self.query(start, end, mouse_ids)
+
+    def export_csv(self, path: str, mouse_ids: Optional[Iterable[str]] = None,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None):
+        with open(path, "w", newline="", encoding="utf-8-sig") as out:
+            w = csv.writer(out, delimiter=";")
+            w.writerow(CSV_HEADER)
+            if self._engine.parallel:
+                # Un fichier jour par worker ; les blocs reviennent dans l'ordre chronologique
+                self.flush()
+                ids = set(mouse_ids) if mouse_ids else None
+                s0 = start.isoformat(timespec="seconds") if start else None
+                s1 = end.isoformat(timespec="seconds") if end else None
+                for chunk in self._engine.export_chunks(self._day_files(start, end), ids, s0, s1):
+                    out.write(chunk)
+                return
+            batch = []
+            for row in self._iter_rows(start, end, mouse_ids):
+                batch.append(format_export_row(row))
+                if len(batch) >= _EXPORT_BATCH:
+                    w.writerows(batch)
+                    batch.clear()
+            if batch:
+                w.writerows(batch)
+
+    # --- Présences par zone (index d'intervalles) ---
+    def _interval_index(self) -> ZoneIntervalIndex:
+        """Construit l'index depuis les fichiers jour au premier appel, puis le tient à jour via add_events."""
+        with self._lock:
+            if self._intervals is None:
+                self.flush()
+                idx = ZoneIntervalIndex()
+                idx.load((ev for full in self._day_files() for ev in iter_raw_events(full)),
+                         now_ms=int(time.time() * 1000))
+                self._intervals = idx
+            return self._intervals
+
+    def who_was_in(self, zone_idx: int, at: datetime) -> List[str]:
+        """Souris présentes dans la zone à l'instant at, sans rejouer le journal."""
+        idx = self._interval_index()
+        with self._lock:
+            return idx.who_at(zone_idx, ts_to_ms(at))
+
+    def occupancy_at(self, at: datetime) -> Dict[int, List[str]]:
+        """Répartition {zone: [ids]} de toute la cage à l'instant at."""
+        idx = self._interval_index()
+        with self._lock:
+            return idx.occupancy_at(ts_to_ms(at))
+
+    def zone_intervals(self, zone_idx: int, start: datetime, end: datetime) -> List[tuple]:
+        """Présences (début, fin ou None si en cours, mouse_id) dans la zone chevauchant [start, end]."""
+        idx = self._interval_index()
+        with self._lock:
+            ivs = idx.intervals(zone_idx, ts_to_ms(start), ts_to_ms(end))
+        return [(ms_to_ts(s), ms_to_ts(e) if e is not None else None, mid) for s, e, mid in ivs]
+
+    # --- Visites (historique compacté) ---
+    def compact_history(self, merge_gap_ms: Optional[int] = None) -> tuple:
+        """Compaction hors ligne de tous les fichiers jour (vérifiée). Retourne (lignes, visites)."""
+        self.flush()
+        skip = set()
+        if self._compactor is not None:
+            # le jour en cours est tenu par la compaction en ligne
+            skip.add(datetime.now().strftime("%Y-%m-%d"))
+            if merge_gap_ms is None:
+                merge_gap_ms = self._compactor.merge_gap_ms
+        return compact_logs(self.dir, DEFAULT_MERGE_GAP_MS if merge_gap_ms is None else merge_gap_ms,
+                            skip_days=skip, now_ms=int(time.time() * 1000))
+
+    def get_visits(self, mouse_id: Optional[str] = None, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> List[Visit]:
+        """
+        Visites chevauchant [start, end]. Un jour sans fichier visits/ est compacté à la volée
+        depuis le fichier jour ; les visites encore ouvertes de la session sont ajoutées.
+        """
+        self.flush()
+        t0 = ts_to_ms(start) if start is not None else None
+        t1 = ts_to_ms(end) if end is not None else None
+        vdir = os.path.join(self.dir, VISITS_DIRNAME)
+        visits: List[Visit] = []
+        for day, fulls in group_by_day(self._day_files(start - timedelta(days=1) if start else None, end)):
+            vpath = os.path.join(vdir, day + ".csv")
+            if os.path.exists(vpath):
+                visits.extend(self._drop_held(read_visits(vpath)))
+            else:
+                visits.extend(self._compact_day(fulls))
+        with self._lock:
+            if self._compactor is not None:
+                visits.extend(self._compactor.open_visits())
+        out = [v for v in visits
+               if (mouse_id is None or v.mouse_id == mouse_id)
+               and (t1 is None or v.enter_ms <= t1)
+               and (t0 is None or v.leave_ms is None or v.leave_ms >= t0)]
+        out.sort(key=lambda v: (v.enter_ms, v.mouse_id))
+        return out
+
+    def export_visits_csv(self, path: str, mouse_ids: Optional[Iterable[str]] = None,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None):
+        ids = set(mouse_ids) if mouse_ids else None
+        with open(path, "w", newline="", encoding="utf-8-sig") as out:
+            w = csv.writer(out, delimiter=";")
+            w.writerow(VISITS_HEADER)
+            for v in self.get_visits(None, start, end):
+                if ids is None or v.mouse_id in ids:
+                    row = v.to_row()
+                    row[3] = v.zone_idx + 1  # zone 1-based, comme export_csv
+                    w.writerow(row)
 
     def preload_ids_from_disk(self):
-        """Retourne tous les mouse_id présents dans les CSV du dossier logs/."""
-        ids = set(self._mem.keys())
+        """Retourne tous les mouse_id présents dans les CSV du dossier logs/ (via le catalogue incrémental)."""
+        with self._lock:
+            ids = set(self._ids)
+        self.flush()
         try:
-            for fname in os.listdir(self.dir):
-                if not fname.endswith(".csv"):
-                    continue
-                full = os.path.join(self.dir, fname)
-                with open(full, "r", encoding="utf-8") as f:
-                    reader = csv.reader(f)
-                    next(reader, None)  # header
-                    for row in reader:
-                        if row and len(row) >= 2 and row[1]:
-                            ids.add(row[1])  # mouse_id
+            ids |= self._catalog.refresh(self._engine if self._engine.parallel else None)
         except Exception:
             pass
         return sorted(ids)
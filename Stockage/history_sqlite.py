@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import csv, os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Iterable, Optional, Union
+
+from Stockage.archive import list_day_files, open_day_text
+from Stockage.history_csv import MouseEvent, CSV_HEADER, ts_to_ms, ms_to_ts, EVENT_NAMES
+from Stockage.scan import EVENT_LABELS_FR
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id       INTEGER PRIMARY KEY,
+    ts       INTEGER NOT NULL,      -- epoch ms (heure locale naïve)
+    mouse_id TEXT    NOT NULL,
+    zone_idx INTEGER NOT NULL,
+    event    TEXT    NOT NULL,
+    seq      INTEGER NOT NULL DEFAULT 0  -- séquence de la session (0 = inconnue), comme les fichiers jour
+);
+CREATE INDEX IF NOT EXISTS idx_events_mouse_ts ON events(mouse_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_zone_ts  ON events(zone_idx, ts);
+"""
+
+
+class HistoryStoreSQLite:
+    """
+    Même interface que HistoryStoreCSV, mais adossé à une base SQLite (WAL) :
+    l'historique multi-jours est interrogeable par index (mouse_id, ts) / (zone_idx, ts)
+    au lieu de relire les CSV du dossier logs/.
+    """
+
+    def __init__(self, dbpath: str = "logs/history.sqlite", batch_size: int = 200,
+                 flush_interval: float = 0.6, import_from: Optional[str] = None):
+        d = os.path.dirname(dbpath)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.path = dbpath
+        self.dir = d or "."  # dossier de la base : fichiers annexes (point de reprise de la présence)
+        self._batch_size = max(1, int(batch_size))
+        self._interval = max(0.0, float(flush_interval))
+        self._lock = threading.RLock()
+        self._pending: List[tuple] = []
+        self._last_commit = time.monotonic()
+
+        # check_same_thread=False : l'accès est sérialisé par self._lock
+        self._db = sqlite3.connect(dbpath, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if "seq" not in {r[1] for r in self._db.execute("PRAGMA table_info(events)")}:
+            self._db.execute("ALTER TABLE events ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")  # base antérieure
+        self._db.commit()
+        self._seq = 0  # séquence monotone des événements de la session
+
+        if import_from and self._is_empty():
+            self.import_csv_logs(import_from)
+
+    # --- Ecriture (par lots) ---
+    def add_event(self, mouse_id: str, zone_idx: int, event: Union[str, int], ts: Union[datetime, int, None] = None):
+        self.add_events(((mouse_id, zone_idx, event, ts),))
+
+    def add_events(self, batch: Iterable[tuple]):
+        """Ajout groupé [(mouse_id, zone_idx, event, ts), ...]."""
+        with self._lock:
+            for mouse_id, zone_idx, event, ts in batch:
+                self._seq += 1
+                self._pending.append((ts if isinstance(ts, int) else ts_to_ms(ts or datetime.now()), mouse_id,
+                                      int(zone_idx), EVENT_NAMES[event] if isinstance(event, int) else event,
+                                      self._seq))
+            if (len(self._pending) >= self._batch_size
+                    or time.monotonic() - self._last_commit >= self._interval):
+                self._commit_pending()
+
+    def _commit_pending(self):
+        if self._pending:
+            rows, self._pending = self._pending, []
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO events(ts, mouse_id, zone_idx, event, seq) VALUES (?, ?, ?, ?, ?)", rows)
+        self._last_commit = time.monotonic()
+
+    def flush(self, release: bool = False):
+        with self._lock:
+            self._commit_pending()
+
+    def close(self):
+        with self._lock:
+            if self._db is None:
+                return
+            self._commit_pending()
+            self._db.close()
+            self._db = None
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            with self._db:
+                self._db.execute("DELETE FROM events")
+
+    # --- Lecture ---
+    def get_mouse_ids(self) -> List[str]:
+        with self._lock:
+            self._commit_pending()
+            # Le parcours de idx_events_mouse_ts suffit (pas de scan de table)
+            cur = self._db.execute("SELECT DISTINCT mouse_id FROM events ORDER BY mouse_id")
+            return [r[0] for r in cur]
+
+    def preload_ids_from_disk(self):
+        return self.get_mouse_ids()
+
+    def get_history(self, mouse_id: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> List[MouseEvent]:
+        sql = "SELECT ts, mouse_id, zone_idx, event, seq FROM events WHERE mouse_id = ?"
+        args = [mouse_id]
+        if start is not None:
+            sql += " AND ts >= ?"; args.append(ts_to_ms(start))
+        if end is not None:
+            sql += " AND ts <= ?"; args.append(ts_to_ms(end))
+        sql += " ORDER BY ts, id"
+        with self._lock:
+            self._commit_pending()
+            rows = self._db.execute(sql, args).fetchall()
+        return [MouseEvent(ts, mid, z, ev, seq) for ts, mid, z, ev, seq in rows]
+
+    def export_csv(self, path: str, mouse_ids: Optional[Iterable[str]] = None,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None):
+        sql = "SELECT ts, mouse_id, zone_idx, event FROM events"
+        where, args = [], []
+        if mouse_ids:
+            ids = list(mouse_ids)
+            where.append(f"mouse_id IN ({','.join('?' * len(ids))})"); args += ids
+        if start is not None:
+            where.append("ts >= ?"); args.append(ts_to_ms(start))
+        if end is not None:
+            where.append("ts <= ?"); args.append(ts_to_ms(end))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts, id"
+        with self._lock:
+            self._commit_pending()
+            cur = self._db.execute(sql, args)
+            with open(path, "w", newline="", encoding="utf-8-sig") as out:
+                w = csv.writer(out, delimiter=";")
+                w.writerow(CSV_HEADER)
+                while True:
+                    rows = cur.fetchmany(1000)
+                    if not rows:
+                        break
+                    w.writerows(
+                        [ms_to_ts(ts).isoformat(timespec="milliseconds"), mid, z + 1, EVENT_LABELS_FR.get(ev, ev)]
+                        for ts, mid, z, ev in rows)
+
+    # --- Migration depuis les CSV existants ---
+    def _is_empty(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM events LIMIT 1").fetchone() is None
+
+    def import_csv_logs(self, dirpath: str = "logs") -> int:
+        """
+        Importe les fichiers jour logs/*.csv et les archives logs/*.csv.gz (timestamp;mouse_id;zone_idx;event[;seq]).
+        Retourne le nb de lignes.
+        """
+        n = 0
+        with self._lock:
+            self._commit_pending()
+            for fname in list_day_files(dirpath):
+                rows = []
+                with open_day_text(os.path.join(dirpath, fname)) as f:
+                    reader = csv.reader(f, delimiter=";")
+                    next(reader, None)  # header
+                    for row in reader:
+                        if len(row) < 4:
+                            continue
+                        try:
+                            rows.append((ts_to_ms(datetime.fromisoformat(row[0])), row[1], int(row[2]), row[3],
+                                         int(row[4]) if len(row) > 4 and row[4] else 0))
+                        except ValueError:
+                            continue
+                with self._db:
+                    self._db.executemany(
+                        "INSERT INTO events(ts, mouse_id, zone_idx, event, seq) VALUES (?, ?, ?, ?, ?)", rows)
+                n += len(rows)
+        return n
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+from typing import Dict, Set
+
+from Stockage.archive import ARCHIVE_SUFFIX, is_day_file
+from Stockage.scan import scan_day_ids
+
+CATALOG_FILENAME = ".ids_catalog.json"
+_CATALOG_VERSION = 1
+
+
+class IdCatalog:
+    """
+    Catalogue persistant des mouse_id par fichier jour (sidecar JSON dans logs/).
+    Pour chaque fichier : taille, mtime, offset déjà lu et IDs distincts.
+    Seuls les fichiers nouveaux ou qui ont grossi sont relus, à partir du dernier offset connu.
+    """
+
+    def __init__(self, dirpath: str, filename: str = CATALOG_FILENAME, delimiter: str = ";"):
+        self.dir = dirpath
+        self.path = os.path.join(dirpath, filename)
+        self._delimiter = delimiter
+        self._files: Dict[str, dict] = {}  # fname -> {"size", "mtime", "offset", "ids"}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == _CATALOG_VERSION:
+                self._files = dict(data.get("files", {}))
+        except Exception:
+            self._files = {}
+
+    def forget(self, fname: str):
+        """Oublie un fichier réécrit (offsets décalés) : il sera relu en entier au prochain refresh."""
+        self._files.pop(fname, None)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": _CATALOG_VERSION, "files": self._files}, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def refresh(self, engine=None) -> Set[str]:
+        """
+        Met à jour le catalogue (coût O(nouvelles données)) et retourne l'union des IDs.
+        engine (ScanEngine) permet de répartir les fichiers à relire sur plusieurs processus.
+        """
+        changed = False
+        seen = set()
+        jobs = []  # (fname, full, offset, entry, stat)
+        names = [f for f in os.listdir(self.dir) if is_day_file(f)]
+        for fname in names:
+            seen.add(fname)
+            full = os.path.join(self.dir, fname)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            entry = self._files.get(fname)
+            if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+                continue
+            if not entry and fname.endswith(ARCHIVE_SUFFIX):
+                # Fichier tout juste archivé : on reprend les IDs du .csv d'origine s'il était à jour
+                src = self._files.get(fname[:-3])
+                if src and src["offset"] == src["size"]:
+                    self._files[fname] = {"size": st.st_size, "mtime": st.st_mtime,
+                                          "offset": st.st_size, "ids": list(src["ids"])}
+                    changed = True
+                    continue
+            if fname.endswith(ARCHIVE_SUFFIX) and entry:
+                entry = None  # une archive ne grossit pas : relecture complète si elle a changé
+            if not entry or st.st_size < entry["offset"]:
+                # Nouveau fichier (ou tronqué/réécrit) : relecture complète
+                entry = {"size": 0, "mtime": 0, "offset": 0, "ids": []}
+            jobs.append((fname, full, entry["offset"], entry, st))
+
+        if jobs:
+            pairs = [(full, off) for _, full, off, _, _ in jobs]
+            results = engine.scan_ids(pairs, self._delimiter) if engine is not None else \
+                [scan_day_ids(full, off, self._delimiter) for full, off in pairs]
+            for (fname, _, _, entry, st), (offset, ids) in zip(jobs, results):
+                entry["offset"] = offset
+                entry["ids"] = sorted(ids.union(entry["ids"]))
+                entry["size"] = st.st_size
+                entry["mtime"] = st.st_mtime
+                self._files[fname] = entry
+            changed = True
+        for fname in list(self._files):
+            if fname not in seen:
+                del self._files[fname]
+                changed = True
+        if changed:
+            self.save()
+        return self.all_ids()
+
+    def all_ids(self) -> Set[str]:
+        ids = set()
+        for entry in self._files.values():
+            ids.update(entry["ids"])
+        return ids
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Index d'intervalles de présence par zone : « qui était dans la zone Z à l'instant T ».
+
+Une présence [début, fin[ va d'un enter (ou d'un stay sans enter connu) au leave suivant de la souris,
+ou à son entrée dans une autre zone. Par zone :
+- les présences terminées, réparties en blocs statiques (méthode logarithmique) : chaque bloc a
+  son arbre d'intervalles centré (stabbing en O(log n + k)) et ses starts triés, pour les fenêtres
+  [t0, t1] = présents à t0 + débuts dans ]t0, t1]. Les tailles des blocs décroissent au moins de
+  moitié d'un bloc au suivant : O(log n) blocs, et un bloc n'est refondu qu'avec un bloc de taille
+  comparable (fusion linéaire des starts), soit O(log n) amorti par présence, jamais une
+  reconstruction de tout l'historique ;
+- un petit tampon des présences terminées depuis le dernier bloc (au plus REBUILD_EVERY), parcouru
+  linéairement (le chargement depuis les fichiers jour forme un seul bloc) ;
+- les présences en cours (souris -> début).
+Au rejeu du journal, un silence de plus de session_gap_ms (arrêt de l'acquisition, jours sans fichier)
+referme toutes les présences en cours au dernier événement : une souris qui n'a plus jamais été lue
+ne reste pas « présente » indéfiniment.
+"""
+import heapq
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Stockage.compaction import SESSION_GAP_MS
+
+REBUILD_EVERY = 256
+
+Interval = Tuple[int, int, str]  # (début ms, fin ms, mouse_id)
+
+
+class _Node:
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, center, by_start, by_end, left, right):
+        self.center = center
+        self.by_start = by_start  # intervalles contenant center, début croissant
+        self.by_end = by_end      # les mêmes, fin décroissante
+        self.left = left
+        self.right = right
+
+
+def _build(intervals: List[Interval]) -> Optional[_Node]:
+    if not intervals:
+        return None
+    pts = sorted(iv[0] for iv in intervals)
+    center = pts[len(pts) // 2]
+    here, left, right = [], [], []
+    for iv in intervals:
+        if iv[1] < center:
+            left.append(iv)
+        elif iv[0] > center:
+            right.append(iv)
+        else:
+            here.append(iv)
+    return _Node(center, sorted(here), sorted(here, key=lambda iv: -iv[1]), _build(left), _build(right))
+
+
+def _stab(node: Optional[_Node], t: int, out: List[Interval]):
+    while node is not None:
+        if t < node.center:
+            for iv in node.by_start:
+                if iv[0] > t:
+                    break
+                out.append(iv)
+            node = node.left
+        else:
+            for iv in node.by_end:
+                if iv[1] <= t:
+                    break
+                out.append(iv)
+            node = node.right
+
+
+class _Block:
+    __slots__ = ("starts", "tree")
+
+    def __init__(self, starts: List[Interval]):
+        self.starts = starts  # triées par début
+        self.tree = _build(starts)
+
+
+class _ZoneIndex:
+    __slots__ = ("blocks", "buffer", "open")
+
+    def __init__(self):
+        self.blocks: List[_Block] = []  # du plus grand au plus petit
+        self.buffer: List[Interval] = []
+        self.open: Dict[str, int] = {}
+
+    def add(self, iv: Interval, bulk: bool = False):
+        self.buffer.append(iv)
+        if not bulk and len(self.buffer) >= REBUILD_EVERY:
+            self.rebuild()
+
+    def rebuild(self):
+        """Tampon -> nouveau bloc, fusionné avec les derniers blocs tant qu'ils ne font pas le double."""
+        if not self.buffer:
+            return
+        starts = sorted(self.buffer)
+        self.buffer = []
+        blocks = self.blocks
+        while blocks and len(blocks[-1].starts) < 2 * len(starts):
+            starts = list(heapq.merge(blocks.pop().starts, starts))
+        blocks.append(_Block(starts))
+
+    def at(self, t: int) -> List[Interval]:
+        out: List[Interval] = []
+        for b in self.blocks:
+            _stab(b.tree, t, out)
+        out += [iv for iv in self.buffer if iv[0] <= t < iv[1]]
+        out += [(s, None, m) for m, s in self.open.items() if s <= t]
+        return out
+
+    def window(self, t0: int, t1: int) -> List[Interval]:
+        out = self.at(t0)
+        lo, hi = (t0, float("inf"), ""), (t1, float("inf"), "")
+        for b in self.blocks:
+            starts = b.starts
+            out += starts[bisect_right(starts, lo):bisect_right(starts, hi)]
+        out += [iv for iv in self.buffer if t0 < iv[0] <= t1]
+        out += [(s, None, m) for m, s in self.open.items() if t0 < s <= t1]
+        return out
+
+
+class ZoneIntervalIndex:
+    def __init__(self):
+        self._zones: Dict[int, _ZoneIndex] = {}
+        self._where: Dict[str, int] = {}  # souris -> zone de sa présence en cours
+        self.count = 0
+        self.last_ms: Optional[int] = None  # dernier événement reçu
+
+    def _zone(self, z: int) -> _ZoneIndex:
+        zi = self._zones.get(z)
+        if zi is None:
+            zi = self._zones[z] = _ZoneIndex()
+        return zi
+
+    def feed(self, mouse_id: str, zone_idx: int, event: str, ts_ms: int, bulk: bool = False):
+        self.last_ms = ts_ms
+        cur = self._where.get(mouse_id)
+        if cur is not None and (event == "leave" or cur != zone_idx):
+            zi = self._zones[cur]
+            start = zi.open.pop(mouse_id)
+            zi.add((start, ts_ms, mouse_id), bulk)
+            del self._where[mouse_id]
+            self.count += 1
+            cur = None
+        if event != "leave" and cur is None:
+            self._where[mouse_id] = zone_idx
+            self._zone(zone_idx).open[mouse_id] = ts_ms
+
+    def close_all(self, ts_ms: int, bulk: bool = False):
+        """Referme toutes les présences en cours à ts_ms (fin de session)."""
+        for mid, z in self._where.items():
+            zi = self._zones[z]
+            zi.add((zi.open.pop(mid), ts_ms, mid), bulk)
+            self.count += 1
+        self._where.clear()
+
+    def load(self, events: Iterable[tuple], session_gap_ms: int = SESSION_GAP_MS, now_ms: Optional[int] = None):
+        """
+        Chargement en masse [(mouse_id, zone_idx, event, ts_ms), ...] dans l'ordre, puis une construction par zone.
+        Les présences sont refermées à chaque silence > session_gap_ms, et en fin de journal si now_ms est
+        donné et que le dernier événement est plus ancien que session_gap_ms.
+        """
+        for mid, z, ev, ts in events:
+            last = self.last_ms
+            if last is not None and ts - last > session_gap_ms:
+                self.close_all(last, bulk=True)
+            self.feed(mid, z, ev, ts, bulk=True)
+        if now_ms is not None and self.last_ms is not None and now_ms - self.last_ms > session_gap_ms:
+            self.close_all(self.last_ms, bulk=True)
+        for zi in self._zones.values():
+            zi.rebuild()
+
+    # --- Requêtes ---
+    def who_at(self, zone_idx: int, t_ms: int) -> List[str]:
+        """Souris présentes dans la zone à l'instant t_ms."""
+        zi = self._zones.get(zone_idx)
+        return sorted({iv[2] for iv in zi.at(t_ms)}) if zi else []
+
+    def intervals(self, zone_idx: int, t0_ms: int, t1_ms: int) -> List[Interval]:
+        """Présences (début, fin ou None si en cours, mouse_id) chevauchant [t0, t1], par début croissant."""
+        zi = self._zones.get(zone_idx)
+        if zi is None:
+            return []
+        return sorted(zi.window(t0_ms, t1_ms), key=lambda iv: (iv[0], iv[2]))
+
+    def occupancy_at(self, t_ms: int) -> Dict[int, List[str]]:
+        """Répartition complète {zone: [ids]} à l'instant t_ms (même forme que les flushs du pilote)."""
+        out = {}
+        for z, zi in self._zones.items():
+            ids = sorted({iv[2] for iv in zi.at(t_ms)})
+            if ids:
+                out[z] = ids
+        return out
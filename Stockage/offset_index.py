@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+INDEX_DIRNAME = ".index"
+SPARSE_EVERY = 1000  # une entrée (timestamp, offset) toutes les N lignes
+_INDEX_VERSION = 2
+
+
+class _DayEntry:
+    __slots__ = ("size", "mtime", "offset", "rows", "mice", "sparse_ts", "sparse_off", "dirty")
+
+    def __init__(self):
+        self.size = 0
+        self.mtime = 0.0
+        self.offset = 0                      # octets déjà indexés (lignes complètes)
+        self.rows = 0                        # lignes indexées (hors en-tête)
+        self.mice: Dict[str, List[int]] = {} # mouse_id -> offsets des lignes
+        self.sparse_ts: List[str] = []       # timestamp ISO d'une ligne sur SPARSE_EVERY
+        self.sparse_off: List[int] = []      # offset de ces lignes
+        self.dirty = False
+
+    def add_row(self, offset: int, mouse_id: str, ts: str):
+        if self.rows % SPARSE_EVERY == 0:
+            self.sparse_ts.append(ts)
+            self.sparse_off.append(offset)
+        self.rows += 1
+        if mouse_id:
+            self.mice.setdefault(mouse_id, []).append(offset)
+
+
+class OffsetIndex:
+    """
+    Index par fichier jour : pour chaque mouse_id, les offsets (octets) de ses lignes,
+    plus un index temporel creux (une ligne sur SPARSE_EVERY) pour les requêtes par période.
+    Permet de relire l'historique d'une souris ou une plage horaire par seek direct.
+    - alimenté au fil de l'eau par note_append() (offsets connus au moment de l'écriture) ;
+    - rattrapage incrémental depuis le dernier offset indexé pour tout ce qui a été écrit ailleurs ;
+    - persisté dans logs/.index/<jour>.json.
+    """
+
+    def __init__(self, dirpath: str, delimiter: str = ";"):
+        self.dir = dirpath
+        self.idx_dir = os.path.join(dirpath, INDEX_DIRNAME)
+        self._delim = delimiter.encode()
+        self._days: Dict[str, _DayEntry] = {}  # chemin du fichier jour -> entrée
+        self._lock = threading.RLock()
+
+    # --- Alimentation au fil des appends ---
+    def note_append(self, fpath: str, offset: int, mouse_id: str, end: int, ts: str):
+        """Une ligne [offset, end) horodatée ts vient d'être écrite pour mouse_id dans fpath."""
+        with self._lock:
+            entry = self._days.get(fpath)
+            if entry is None:
+                self._ensure(fpath)  # premier append : charge/rattrape (inclut cette ligne)
+                return
+            if entry.offset != offset:
+                return  # non contigu : le rattrapage relira depuis entry.offset
+            entry.add_row(offset, mouse_id, ts)
+            entry.offset = end
+            entry.dirty = True
+
+    # --- Lecture ---
+    def offsets_for(self, fpath: str, mouse_id: str) -> List[int]:
+        with self._lock:
+            entry = self._ensure(fpath)
+            if entry is None:
+                return []
+            return list(entry.mice.get(mouse_id, ()))
+
+    def seek_offset(self, fpath: str, ts: Optional[str]) -> int:
+        """
+        Offset à partir duquel lire pour ne rien manquer après ts (lignes en ordre chronologique) :
+        la dernière entrée creuse strictement antérieure à ts, soit au plus SPARSE_EVERY lignes de trop.
+        0 = début du fichier (en-tête compris).
+        """
+        with self._lock:
+            entry = self._ensure(fpath)
+            if entry is None or ts is None:
+                return 0
+            i = bisect_left(entry.sparse_ts, ts) - 1
+            return entry.sparse_off[i] if i >= 0 else 0
+
+    def mouse_ids(self, fpath: str) -> List[str]:
+        with self._lock:
+            entry = self._ensure(fpath)
+            return sorted(entry.mice) if entry else []
+
+    def forget(self, fpath: Optional[str] = None):
+        with self._lock:
+            if fpath is None:
+                self._days.clear()
+            else:
+                self._days.pop(fpath, None)
+
+    def save(self):
+        with self._lock:
+            for fpath, entry in self._days.items():
+                if entry.dirty:
+                    self._save_entry(fpath, entry)
+
+    # --- Interne ---
+    def _ensure(self, fpath: str) -> Optional[_DayEntry]:
+        try:
+            st = os.stat(fpath)
+        except OSError:
+            self._days.pop(fpath, None)
+            return None
+        entry = self._days.get(fpath)
+        if entry is None:
+            entry = self._load_entry(fpath) or _DayEntry()
+            self._days[fpath] = entry
+        if st.st_size < entry.offset:
+            entry = self._days[fpath] = _DayEntry()  # fichier tronqué/réécrit
+        entry.size, entry.mtime = st.st_size, st.st_mtime
+        if st.st_size > entry.offset:
+            self._catch_up(fpath, entry)
+            self._save_entry(fpath, entry)
+        return entry
+
+    def _catch_up(self, fpath: str, entry: _DayEntry):
+        pos = entry.offset
+        with open(fpath, "rb") as f:
+            f.seek(pos)
+            if pos == 0:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return
+                pos = f.tell()
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # ligne en cours d'écriture
+                parts = line.split(self._delim, 2)
+                if len(parts) >= 2:
+                    entry.add_row(pos, parts[1].decode("utf-8", errors="ignore"),
+                                  parts[0].decode("utf-8", errors="ignore"))
+                pos += len(line)
+        entry.offset = pos
+        entry.dirty = True
+
+    def _sidecar(self, fpath: str) -> str:
+        return os.path.join(self.idx_dir, os.path.basename(fpath) + ".json")
+
+    def _load_entry(self, fpath: str) -> Optional[_DayEntry]:
+        try:
+            with open(self._sidecar(fpath), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != _INDEX_VERSION:
+                return None
+            st = os.stat(fpath)
+            # Un fichier qui a rétréci ou dont le début a changé n'est plus fiable
+            if st.st_size < data["offset"]:
+                return None
+            entry = _DayEntry()
+            entry.size, entry.mtime = data["size"], data["mtime"]
+            entry.offset = data["offset"]
+            entry.rows = data["rows"]
+            entry.mice = {k: list(v) for k, v in data["mice"].items()}
+            entry.sparse_ts = list(data["sparse_ts"])
+            entry.sparse_off = list(data["sparse_off"])
+            return entry
+        except Exception:
+            return None
+
+    def _save_entry(self, fpath: str, entry: _DayEntry):
+        try:
+            os.makedirs(self.idx_dir, exist_ok=True)
+            path = self._sidecar(fpath)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": _INDEX_VERSION, "size": entry.size, "mtime": entry.mtime,
+                           "offset": entry.offset, "rows": entry.rows, "mice": entry.mice,
+                           "sparse_ts": entry.sparse_ts, "sparse_off": entry.sparse_off},
+                          f, separators=(",", ":"))
+            os.replace(tmp, path)
+            entry.dirty = False
+        except Exception:
+            pass
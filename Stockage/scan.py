@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de parcours des fichiers jour : un fichier = une tâche.
+Les fonctions de niveau module sont exécutables dans un processus worker (picklables) ;
+ScanEngine les répartit sur un ProcessPoolExecutor ou les exécute en séquentiel.
+"""
+import csv, os
+import io
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from Stockage.archive import ARCHIVE_SUFFIX, open_day_binary, open_day_text
+
+APP_LOGGER_NAME = "app"
+
+EVENT_LABELS_FR = {"enter": "Entree", "stay": "Presence", "leave": "Sortie"}
+
+_SNIFF_BYTES = 4096    # échantillon pour détecter le séparateur (en-tête + quelques lignes)
+
+
+class _DefaultDialect(csv.excel):
+    delimiter = ";"
+
+
+# --- Tâches par fichier ---
+def iter_day_rows(full: str, ids: Optional[Set[str]] = None, s0: Optional[str] = None,
+                  s1: Optional[str] = None) -> Iterator[List[str]]:
+    """Lignes brutes [timestamp, mouse_id, zone_idx, event] d'un fichier jour, filtrées (ISO comparées en chaînes)."""
+    with open_day_text(full) as f:
+        sample = f.read(_SNIFF_BYTES)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,")
+        except Exception:
+            dialect = _DefaultDialect
+        f.seek(0)
+        reader = csv.reader(f, dialect)
+        next(reader, None)  # skip header
+        for row in reader:
+            if len(row) < 3:
+                continue
+            if ids is not None and row[1] not in ids:
+                continue
+            if s0 is not None and row[0] < s0:
+                continue
+            if s1 is not None and row[0][:19] > s1:
+                continue
+            yield row
+
+
+def format_export_row(row: List[str]) -> tuple:
+    """Ligne disque -> ligne d'export (zone 1-based, événement en français)."""
+    ev_en = row[3] if len(row) > 3 else ""
+    try:
+        z1 = str(int(row[2]) + 1)
+    except Exception:
+        z1 = row[2]  # au cas où ce ne serait pas un entier
+    return (row[0], row[1], z1, EVENT_LABELS_FR.get(ev_en, ev_en))
+
+
+def export_day_chunk(full: str, ids: Optional[Set[str]] = None, s0: Optional[str] = None,
+                     s1: Optional[str] = None) -> str:
+    """Export d'un fichier jour, déjà formaté en texte CSV (résultat compact à renvoyer au parent)."""
+    buf = io.StringIO()
+    csv.writer(buf, delimiter=";").writerows(format_export_row(r) for r in iter_day_rows(full, ids, s0, s1))
+    return buf.getvalue()
+
+
+def scan_day_ids(full: str, offset: int = 0, delimiter: str = ";") -> Tuple[int, Set[str]]:
+    """
+    mouse_id distincts d'un fichier jour à partir de offset (lignes complètes seulement).
+    Retourne (nouvel offset, ids). Une archive .csv.gz est toujours relue en entier.
+    """
+    ids: Set[str] = set()
+    if full.endswith(ARCHIVE_SUFFIX):
+        with open_day_binary(full) as f:
+            data = f.read()
+        _parse_ids(data, True, ids, delimiter)
+        return os.path.getsize(full), ids
+    with open(full, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1  # ligne en cours d'écriture : relue au prochain passage
+    if end <= 0:
+        return offset, ids
+    _parse_ids(data[:end], offset == 0, ids, delimiter)
+    return offset + end, ids
+
+
+def _parse_ids(data: bytes, with_header: bool, ids: Set[str], delimiter: str):
+    lines = data.decode("utf-8", errors="ignore").splitlines()
+    if with_header and lines:
+        lines = lines[1:]  # header
+    for row in csv.reader(lines, delimiter=delimiter):
+        if len(row) >= 2 and row[1]:
+            ids.add(row[1])
+
+
+def _scan_ids_job(args):
+    return scan_day_ids(*args)
+
+
+def _export_job(args):
+    return export_day_chunk(*args)
+
+
+class ScanEngine:
+    """
+    Répartit les fichiers jour sur workers processus (ProcessPoolExecutor).
+    workers <= 1 : exécution séquentielle dans le processus courant.
+    Les résultats sont rendus dans l'ordre des fichiers (chronologique), avec au plus
+    2 x workers tâches en vol pour borner la mémoire.
+    """
+
+    def __init__(self, workers: Optional[int] = None, logger=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(1, int(workers))
+        self.logger = logger or logging.getLogger(APP_LOGGER_NAME)
+
+    @property
+    def parallel(self) -> bool:
+        return self.workers > 1
+
+    def _map(self, fn, jobs: List[tuple]) -> Iterator:
+        if not self.parallel or len(jobs) < 2:
+            for job in jobs:
+                yield fn(job)
+            return
+        try:
+            # spawn : le processus hôte a des threads vivants (écriture, Qt, série) ; un fork les copierait
+            # en plein milieu (verrous tenus) et pourrait bloquer les workers
+            pool = ProcessPoolExecutor(max_workers=min(self.workers, len(jobs)),
+                                       mp_context=multiprocessing.get_context("spawn"))
+        except Exception as e:
+            self.logger.warning(f"Scan parallèle indisponible ({e}), repli séquentiel.")
+            for job in jobs:
+                yield fn(job)
+            return
+        with pool:
+            pending = deque()
+            it = iter(jobs)
+            for job in it:
+                pending.append(pool.submit(fn, job))
+                if len(pending) >= 2 * self.workers:
+                    break
+            while pending:
+                yield pending.popleft().result()
+                nxt = next(it, None)
+                if nxt is not None:
+                    pending.append(pool.submit(fn, nxt))
+
+    def export_chunks(self, paths: Iterable[str], ids: Optional[Set[str]] = None,
+                      s0: Optional[str] = None, s1: Optional[str] = None) -> Iterator[str]:
+        """Blocs CSV d'export, fichier par fichier, dans l'ordre chronologique."""
+        return self._map(_export_job, [(p, ids, s0, s1) for p in paths])
+
+    def scan_ids(self, jobs: List[Tuple[str, int]], delimiter: str = ";") -> List[Tuple[int, Set[str]]]:
+        """[(chemin, offset), ...] -> [(nouvel offset, ids), ...] (même ordre)."""
+        return list(self._map(_scan_ids_job, [(p, off, delimiter) for p, off in jobs]))
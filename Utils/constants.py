@@ -28,6 +28,10 @@ IDTAG_TO_NAME = {
     #  "Souris-08": "Souris Theta"
 }
 
+# ======== Anti-rebond des lectures (Domaine/filtre_rebond.py) ========
+DEBOUNCE_MISS_CYCLES   = 2   # flushs consécutifs sans lecture avant une sortie
+DEBOUNCE_CONFIRM_READS = 2   # flushs consécutifs dans une autre zone avant un changement
+
 # ======== Commandes du multiplexeur PE42582A-X========
 CMD_SCAN_ON  = "SCAN 1"
 CMD_SCAN_OFF = "SCAN 0"
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Découpage en lignes d'un flux d'octets série, sans recopie par ligne.
+
+Les octets reçus sont ajoutés à un bytearray lu à partir d'un curseur ; à chaque feed(), tout ce qui
+précède le dernier séparateur est décodé en une seule fois (memoryview, pas de copie intermédiaire)
+puis découpé en str. Le tampon n'est compacté que lorsque la partie consommée dépasse compact_at,
+ou vidé quand tout a été lu : le coût reste linéaire même pour une rafale de milliers de lignes.
+"""
+from typing import List
+
+NEWLINE_LF = "lf"    # séparateur \n (un \r final est retiré avec les blancs)
+NEWLINE_ANY = "any"  # \n, \r\n ou \r isolé
+
+
+class LineFramer:
+    def __init__(self, newline: str = NEWLINE_LF, strip: bool = True, encoding: str = "utf-8",
+                 errors: str = "ignore", compact_at: int = 64 * 1024, max_pending: int = 1 << 20):
+        if newline not in (NEWLINE_LF, NEWLINE_ANY):
+            raise ValueError(f"newline inconnu: {newline!r}")
+        self.newline = newline
+        self.strip = strip  # True : blancs retirés et lignes vides ignorées
+        self.encoding = encoding
+        self.errors = errors
+        self.compact_at = compact_at
+        self.max_pending = max_pending  # octets sans séparateur au-delà desquels on jette le fragment
+        self._buf = bytearray()
+        self._pos = 0
+        self._cr = False  # NEWLINE_ANY : le dernier tampon finissait par \r, son \n peut suivre
+        self.lines = 0
+        self.dropped_bytes = 0
+
+    def feed(self, data) -> List[str]:
+        """Ajoute des octets ; retourne les lignes complètes (str) dans l'ordre."""
+        buf = self._buf
+        start = len(buf)
+        buf += data
+        if self._cr and len(buf) > start:
+            # \r\n coupé entre deux lectures : ce \n termine la ligne déjà rendue au \r
+            self._cr = False
+            if buf[start] == 0x0A:
+                start += 1
+                self._pos = start
+        # la partie en attente ne contient aucun séparateur : on ne cherche que dans data
+        end = buf.rfind(b"\n", start)
+        if self.newline == NEWLINE_ANY:
+            end = max(end, buf.rfind(b"\r", start))
+            if len(buf) > start:
+                self._cr = end == len(buf) - 1 and buf[end] == 0x0D
+        if end < 0:
+            if len(buf) - self._pos > self.max_pending:
+                self.dropped_bytes += len(buf) - self._pos
+                self.clear()
+            return []
+        stop = end
+        if self.newline == NEWLINE_ANY and buf[end] == 0x0A and end > self._pos and buf[end - 1] == 0x0D:
+            stop -= 1  # \r\n final : le \r fait partie du séparateur
+        with memoryview(buf)[self._pos:stop] as mv:  # libéré avant tout redimensionnement
+            text = str(mv, self.encoding, self.errors)
+        self._pos = end + 1
+        if self._pos == len(buf):
+            buf.clear()
+            self._pos = 0
+        elif self._pos >= self.compact_at:
+            del buf[:self._pos]
+            self._pos = 0
+
+        if self.newline == NEWLINE_ANY:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        out = text.split("\n")
+        if self.strip:
+            out = [s for s in map(str.strip, out) if s]
+        self.lines += len(out)
+        return out
+
+    def pending(self) -> int:
+        """Octets reçus en attente de séparateur."""
+        return len(self._buf) - self._pos
+
+    def clear(self):
+        self._buf.clear()
+        self._pos = 0
+        self._cr = False
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Octets par événement (tracemalloc) : ancien @dataclass MouseEvent (datetime + str neuf)
+contre MouseEvent compact (__slots__, epoch ms, mouse_id interné, code d'événement).
+
+    python -m bench.bench_event_memory [nb_evenements]
+"""
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from Stockage.history_csv import MouseEvent, EV_ENTER, EV_STAY, EV_LEAVE
+
+
+@dataclass
+class LegacyMouseEvent:
+    ts: datetime
+    mouse_id: str
+    zone_idx: int
+    event: str
+
+
+def build_legacy(n, t0):
+    names = ("enter", "stay", "leave")
+    # "".join(...) : une chaîne neuve par événement, comme resolve_idtag() sur chaque flush
+    return [LegacyMouseEvent(t0 + timedelta(milliseconds=600 * i), "".join(("Souris-", "%02d" % (i % 8))),
+                             i % 15, names[i % 3]) for i in range(n)]
+
+
+def build_compact(n, t0):
+    codes = (EV_ENTER, EV_STAY, EV_LEAVE)
+    ms0 = int(t0.timestamp() * 1000)
+    return [MouseEvent(ms0 + 600 * i, "".join(("Souris-", "%02d" % (i % 8))), i % 15, codes[i % 3])
+            for i in range(n)]
+
+
+def measure(label, fn, n):
+    tracemalloc.start()
+    t = time.perf_counter()
+    events = fn(n, datetime(2025, 11, 12))
+    dt = time.perf_counter() - t
+    cur, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<8} {cur / n:6.1f} octets/événement   {cur / 2**20:7.1f} MiB   {dt:5.2f} s")
+    del events
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{n} événements")
+    measure("legacy", build_legacy, n)
+    measure("compact", build_compact, n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark export_csv : ancienne version (f.read() + Sniffer sur tout le fichier + StringIO)
+contre la version en flux. Mesure le temps et le pic mémoire (tracemalloc).
+
+    python -m bench.bench_export [dossier_logs]
+"""
+import csv, os, io
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from Stockage.history_csv import HistoryStoreCSV, CSV_HEADER
+from Stockage.scan import EVENT_LABELS_FR
+
+
+def legacy_export(dirpath, path, mouse_ids=None):
+    with open(path, "w", newline="", encoding="utf-8-sig") as out:
+        w = csv.writer(out, delimiter=";")
+        w.writerow(CSV_HEADER)
+        for fname in sorted(os.listdir(dirpath)):
+            if not fname.endswith(".csv"):
+                continue
+            with open(os.path.join(dirpath, fname), "r", encoding="utf-8-sig") as f:
+                data = f.read()
+            try:
+                dialect = csv.Sniffer().sniff(data, delimiters=";,")
+            except Exception:
+                class _D: delimiter = ";"
+                dialect = _D()
+            reader = csv.reader(io.StringIO(data), dialect)
+            next(reader, None)
+            for row in reader:
+                if not row:
+                    continue
+                if mouse_ids and row[1] not in mouse_ids:
+                    continue
+                ev_en = row[3] if len(row) > 3 else ""
+                try:
+                    z1 = str(int(row[2]) + 1)
+                except Exception:
+                    z1 = row[2]
+                w.writerow([row[0], row[1], z1, EVENT_LABELS_FR.get(ev_en, ev_en)])
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<10} {dt * 1000:8.1f} ms   pic {peak / 1024:8.1f} KiB")
+
+
+def run(dirpath, title):
+    out = os.path.join(tempfile.mkdtemp(), "export.csv")
+    store = HistoryStoreCSV(dirpath)
+    print(title)
+    measure("legacy", lambda: legacy_export(dirpath, out))
+    measure("stream", lambda: store.export_csv(out))
+
+
+def main():
+    logs = sys.argv[1] if len(sys.argv) > 1 else "logs"
+    run(logs, f"{logs}/ (tous les fichiers jour)")
+    # historique.csv (54k lignes) isolé comme un fichier jour unique
+    if os.path.exists("historique.csv"):
+        tmp = tempfile.mkdtemp()
+        shutil.copy("historique.csv", os.path.join(tmp, "2025-01-01.csv"))
+        run(tmp, "historique.csv")
+
+
+if __name__ == "__main__":
+    main()
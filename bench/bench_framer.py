@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Découpage en lignes d'une rafale série (lignes/s) : anciennes boucles de _SerialWorker.run
+(buf += chunk ; split(b"\\n", 1) par ligne) et de SerialClient._on_ready (tranche du bytearray
+par ligne, \\r normalisés) contre Utils.framer.LineFramer, pour des rafales de 1 à 8192 lignes
+livrées par blocs de 4 Kio (lecture in_waiting) puis d'un seul bloc (readAll() après une rafale).
+Vérifie aussi que les lignes produites sont identiques.
+
+    python -m bench.bench_framer [nb_repetitions]
+"""
+import random
+import sys
+import time
+
+from Utils.framer import LineFramer, NEWLINE_ANY
+
+CHUNKS = (4096, None)  # None : la rafale entière en un bloc
+BURSTS = (1, 64, 1024, 8192)
+
+
+def legacy_worker(chunks):
+    out = []
+    buf = b""
+    for chunk in chunks:
+        buf += chunk
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            text = line.decode(errors="ignore").strip()
+            if text:
+                out.append(text)
+    return out
+
+
+def legacy_client(chunks):
+    out = []
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        while True:
+            nl = buf.find(b"\n")
+            if nl < 0:
+                break
+            raw = buf[:nl]
+            buf = buf[nl + 1:]
+            text = raw.decode("utf-8", errors="ignore").strip()
+            if text:
+                out.append(text)
+    return out
+
+
+def framer_lf(chunks):
+    f = LineFramer()
+    out = []
+    for chunk in chunks:
+        out += f.feed(chunk)
+    return out
+
+
+def framer_any(chunks):
+    f = LineFramer(NEWLINE_ANY)
+    out = []
+    for chunk in chunks:
+        out += f.feed(chunk)
+    return out
+
+
+def make_burst(n_lines: int) -> bytes:
+    rnd = random.Random(n_lines)
+    lines = []
+    for _ in range(n_lines):
+        z = rnd.randint(1, 15)
+        ids = ",".join("E2801160%08X" % rnd.getrandbits(32) for _ in range(rnd.randint(0, 3)))
+        lines.append(f"Z:{z:02d} ID:{ids}\r\n" if rnd.random() < 0.9 else "#piDEBUG: DRIVER=1 GPIO=2 LS=0 CODE=0x1F\r\n")
+    return "".join(lines).encode()
+
+
+def main():
+    reps = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    variants = [("worker (ancien)", legacy_worker), ("client (ancien)", legacy_client),
+                ("LineFramer lf", framer_lf), ("LineFramer any", framer_any)]
+    print(f"{'rafale':>7} {'bloc':>6} " + " ".join(f"{name:>17}" for name, _ in variants) + "   (lignes/s)")
+    for n, size in [(n, c) for c in CHUNKS for n in BURSTS]:
+        data = make_burst(n)
+        size = size or len(data)
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        ref = legacy_worker(chunks)
+        rates = []
+        for name, fn in variants:
+            if fn(chunks) != ref:
+                raise AssertionError(f"{name}: lignes différentes pour une rafale de {n}")
+            k = max(1, 20000 // n) * reps
+            t0 = time.perf_counter()
+            for _ in range(k):
+                fn(chunks)
+            rates.append(n * k / (time.perf_counter() - t0))
+        print(f"{n:>7} {size:>6} " + " ".join(f"{r:>17,.0f}" for r in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Coût par flush du calcul des événements de présence, à 10 / 100 / 1000 tags :
+ancienne boucle Python de ControleDonnee._on_raw_update contre PresenceTable
+(NumPy, et repli ensembles Python). Vérifie aussi que les événements émis sont identiques,
+puis mesure côté store (HistoryStoreCSV background) : un add_event par changement contre add_events(lot).
+
+    python -m bench.bench_presence [nb_flushs]
+"""
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from Domaine.presence import PresenceTable
+from Stockage.history_csv import HistoryStoreCSV, WRITER_BACKGROUND, EV_ENTER, EV_STAY, EV_LEAVE
+
+N_ZONES = 15
+
+
+class LegacyDiff:
+    """Algorithme d'avant PresenceTable (dict par souris, un add_event par changement)."""
+
+    def __init__(self):
+        self.last_presence = {}
+        self.last_event = {}
+
+    def diff(self, current):
+        out = []
+        last_event = self.last_event
+        for mid, z in current.items():
+            if mid not in self.last_presence:
+                out.append((mid, z, EV_ENTER)); last_event[mid] = (EV_ENTER, z)
+            else:
+                prev_z = self.last_presence[mid]
+                if prev_z == z:
+                    if last_event.get(mid) != (EV_STAY, z):
+                        out.append((mid, z, EV_STAY)); last_event[mid] = (EV_STAY, z)
+                else:
+                    out.append((mid, prev_z, EV_LEAVE)); out.append((mid, z, EV_ENTER))
+                    last_event[mid] = (EV_ENTER, z)
+        for mid, prev_z in self.last_presence.items():
+            if mid not in current:
+                out.append((mid, prev_z, EV_LEAVE)); last_event[mid] = (EV_LEAVE, prev_z)
+        self.last_presence = dict(current)
+        return out
+
+
+def frames(n_tags, n_flushes, seed=1):
+    """Suite de flushs : ~5 % de déplacements, ~3 % de disparitions / réapparitions par flush."""
+    rnd = random.Random(seed)
+    names = [f"TAG{i:05d}" for i in range(n_tags)]
+    state = {m: rnd.randrange(N_ZONES) for m in names}
+    out = []
+    for _ in range(n_flushes):
+        for m in rnd.sample(names, max(1, n_tags // 20)):
+            state[m] = rnd.randrange(N_ZONES)
+        for m in rnd.sample(names, max(1, n_tags // 33)):
+            if m in state:
+                del state[m]
+            else:
+                state[m] = rnd.randrange(N_ZONES)
+        out.append(dict(state))
+    return out
+
+
+def run(engine, seq):
+    t = time.perf_counter()
+    n = 0
+    for cur in seq:
+        n += len(engine.diff(cur))
+    return (time.perf_counter() - t) / len(seq), n
+
+
+def main():
+    n_flushes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{n_flushes} flushs par taille ; temps moyen par flush")
+    for n_tags in (10, 100, 1000):
+        seq = frames(n_tags, n_flushes)
+        ref, new = LegacyDiff(), PresenceTable()
+        for cur in seq[:200]:  # équivalence (à l'ordre près dans un même flush)
+            assert sorted(ref.diff(cur)) == sorted(new.diff(cur)), "événements différents"
+        line = [f"  {n_tags:5d} tags :"]
+        for label, engine in (("ancien", LegacyDiff()), ("numpy", PresenceTable()),
+                              ("ensembles", PresenceTable(use_numpy=False))):
+            dt, n = run(engine, seq)
+            line.append(f"{label} {dt * 1e6:8.1f} µs")
+        print("   ".join(line) + f"   ({n / len(seq):.0f} événements/flush)")
+
+    print("Enregistrement dans HistoryStoreCSV (background), 1000 tags, temps moyen par flush")
+    seq = frames(1000, min(n_flushes, 500))
+    batches, table, t0 = [], PresenceTable(), int(time.time() * 1000)
+    for k, cur in enumerate(seq):
+        batches.append([(m, z, c, t0 + 600 * k) for m, z, c in table.diff(cur)])
+    for label, batched in (("add_event x N", False), ("add_events", True)):
+        d = tempfile.mkdtemp(prefix="bench_presence_")
+        store = HistoryStoreCSV(d, writer=WRITER_BACKGROUND)
+        t = time.perf_counter()
+        for batch in batches:
+            if batched:
+                store.add_events(batch)
+            else:
+                for ev in batch:
+                    store.add_event(*ev)
+        dt = (time.perf_counter() - t) / len(batches)
+        store.close()
+        shutil.rmtree(d, ignore_errors=True)
+        print(f"  {label:<14} {dt * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark du moteur de parcours : export complet et construction du catalogue d'IDs
+(à froid) en séquentiel puis avec 2 et 4 processus workers.
+
+    python -m bench.bench_scan [dossier_logs]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from Stockage.history_csv import HistoryStoreCSV
+from Stockage.id_catalog import CATALOG_FILENAME
+
+
+def count_rows(dirpath):
+    n = 0
+    for fname in os.listdir(dirpath):
+        if fname.endswith(".csv"):
+            with open(os.path.join(dirpath, fname), "rb") as f:
+                n += sum(1 for _ in f) - 1
+    return n
+
+
+def main():
+    src = sys.argv[1] if len(sys.argv) > 1 else "logs"
+    work = tempfile.mkdtemp()
+    logs = os.path.join(work, "logs")
+    shutil.copytree(src, logs, ignore=shutil.ignore_patterns(".*", "*.log*"))
+    rows = count_rows(logs)
+    out = os.path.join(work, "export.csv")
+    print(f"{rows} lignes, {os.cpu_count()} CPU")
+    for workers in (1, 2, 4):
+        store = HistoryStoreCSV(logs, scan_workers=workers)
+        t0 = time.perf_counter()
+        store.export_csv(out)
+        t_exp = time.perf_counter() - t0
+
+        try: os.remove(os.path.join(logs, CATALOG_FILENAME))
+        except OSError: pass
+        store = HistoryStoreCSV(logs, scan_workers=workers)  # catalogue vide : parcours complet
+        t0 = time.perf_counter()
+        n_ids = len(store.preload_ids_from_disk())
+        t_ids = time.perf_counter() - t0
+        print(f"  workers={workers}: export {t_exp * 1000:7.1f} ms ({rows / t_exp:9.0f} lignes/s)"
+              f"   catalogue {t_ids * 1000:7.1f} ms ({n_ids} IDs)")
+    shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Lecteur série du _SerialWorker sur une boucle pty (POSIX) : mode poll (read 256 / timeout 50 ms)
+contre mode select (descripteur du port + tube de réveil, lecture en bloc).
+- CPU consommé à vide, pendant quelques secondes sans trafic ;
+- aller-retour d'une commande : enqueue_tx("PING n") -> écho "#piDEBUG:PONG n" côté pty -> ligne classée.
+
+    python -m bench.bench_serial_reader [nb_pings] [secondes_a_vide]
+"""
+import logging
+import os
+import pty
+import statistics
+import sys
+import threading
+import time
+
+from PyQt5 import QtCore
+
+from Pilotes.classifieur import LineDispatcher, MSG_PI
+from Pilotes.stm32controle_serial import _SerialWorker, READER_POLL, READER_SELECT
+
+
+def _echo(master: int, stop: threading.Event):
+    """Côté « carte » : chaque ligne PING n reçue est renvoyée en #piDEBUG:PONG n."""
+    buf = b""
+    while not stop.is_set():
+        try:
+            data = os.read(master, 4096)
+        except OSError:
+            return
+        buf += data
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            if line.startswith(b"PING"):
+                os.write(master, b"#piDEBUG:PONG" + line[4:] + b"\n")
+
+
+def run_mode(reader: str, n_pings: int, idle_s: float):
+    master, slave = pty.openpty()
+    stop = threading.Event()
+    echo = threading.Thread(target=_echo, args=(master, stop), daemon=True)
+    echo.start()
+
+    dispatcher = LineDispatcher()
+    worker = _SerialWorker(os.ttyname(slave), 115200, logger=logging.getLogger("bench"), reader=reader,
+                           dispatcher=dispatcher)
+    connected = threading.Event()
+    got = threading.Event()
+    # Pas de boucle d'événements Qt ici : appels directs dans le thread du worker
+    worker.connected.connect(lambda _p: connected.set(), QtCore.Qt.DirectConnection)
+    dispatcher.subscribe(MSG_PI, lambda _k, _t, _v: got.set())
+    th = threading.Thread(target=worker.run, daemon=True)
+    th.start()
+    if not connected.wait(5):
+        raise RuntimeError("port pty non ouvert")
+
+    time.sleep(0.2)
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    time.sleep(idle_s)
+    idle_cpu = (time.process_time() - cpu0) / (time.perf_counter() - t0) * 1000.0  # ms CPU / s
+
+    rtts = []
+    for i in range(n_pings):
+        got.clear()
+        t = time.perf_counter()
+        worker.enqueue_tx(f"PING {i}")
+        if not got.wait(2):
+            raise RuntimeError(f"pas d'écho pour PING {i}")
+        rtts.append((time.perf_counter() - t) * 1000.0)
+
+    worker.stop()
+    th.join(2)
+    stop.set()
+    os.close(slave)
+    os.close(master)
+    return idle_cpu, rtts
+
+
+def main():
+    n_pings = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    idle_s = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    logging.getLogger("bench").setLevel(logging.WARNING)
+    print(f"{'lecteur':<8} {'CPU à vide':>14} {'RTT médian':>11} {'RTT p95':>9} {'RTT max':>9}")
+    for reader in (READER_POLL, READER_SELECT):
+        idle_cpu, rtts = run_mode(reader, n_pings, idle_s)
+        rtts.sort()
+        print(f"{reader:<8} {idle_cpu:>9.2f} ms/s {statistics.median(rtts):>8.2f} ms "
+              f"{rtts[int(len(rtts) * 0.95) - 1]:>6.2f} ms {rtts[-1]:>6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
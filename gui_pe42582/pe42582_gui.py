@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-import sys, re, random
+import sys, random
 from PyQt5.QtCore import Qt, QObject, pyqtSignal, QTimer, QIODevice
 from PyQt5.QtGui import QIntValidator, QCloseEvent, QTextCursor
 from PyQt5.QtWidgets import (
@@ -9,6 +9,8 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtSerialPort import QSerialPort, QSerialPortInfo
 from Utils.constants import *
+from Utils.framer import LineFramer, NEWLINE_ANY
+from Pilotes.classifieur import classify, MSG_ANT, MSG_LIST, MSG_DEBUG, MSG_PI
 
 # ======== Commandes ========
 CMD_SCAN_ON  = "SCAN 1"
@@ -33,6 +35,9 @@ FAKE_UIDS = [
     "Souris-08",
 ]
 
+# Types de messages '#pi' consommés par la fenêtre
+_PI_KINDS = (MSG_ANT, MSG_LIST, MSG_DEBUG, MSG_PI)
+
 def available_ports():
     return QSerialPortInfo.availablePorts()
 
@@ -41,7 +46,8 @@ class SerialClient(QObject):
     """
     Client série bi-mode :
     - 'direct' : QSerialPort
-    - 'shared' : s'abonne à un bridge (QObject: line/connected/disconnected + write_line)
+    - 'shared' : s'abonne à un bridge (QObject: messages/connected/disconnected + write_line + subscribe)
+    Dans les deux modes, les lignes '#pi' arrivent déjà classées (Pilotes.classifieur).
     """
     lineParsed   = pyqtSignal(str)
     antChanged   = pyqtSignal(int)
@@ -57,23 +63,19 @@ class SerialClient(QObject):
         self.port_name = None
         self.logging_enabled = True
 
-        self.re_ant   = re.compile(r"^\s*ANT\s*=\s*(\d+)\s*$")
-        self.re_list  = re.compile(r"^\s*LIST\s*=\s*([\d,\s;]+)\s*$")
-        self.re_debug = re.compile(r"^DEBUG:\s+DRIVER=(\d+)\s+GPIO=(\d+)\s+LS=(\d+)\s+CODE=0x([0-9A-Fa-f]{2})\s*$")
-
         if self._shared:
             # alors on s’abonne aux signaux du pont : notification de connexion/déconnexion,
-            # et réception des lignes texte déjà lues ailleurs (le filtrage #pi et le parsing
-            # seront faits dans _on_shared_filtre_line → _parse_and_emit).
+            # et messages '#pi' déjà classés dans le thread du lecteur (les lignes Z: ne traversent pas).
             self.bridge = bridge
             self.bridge.connected.connect(self._on_shared_connected)
             self.bridge.disconnected.connect(self._on_shared_disconnected)
-            self.bridge.line.connect(self._on_shared_filtre_line)
+            self.bridge.messages.connect(self._on_messages)
+            self.bridge.subscribe(*_PI_KINDS)
         else:
             self.uart = QSerialPort(self)
             self.uart.setBaudRate(baud)
             self.uart.readyRead.connect(self._on_ready)
-            self._buffer = bytearray()
+            self._framer = LineFramer(NEWLINE_ANY)
 
     def set_logging(self, on: bool):
         self.logging_enabled = on
@@ -101,7 +103,7 @@ class SerialClient(QObject):
         self.uart.setPortName(name)
         success = self.uart.open(QIODevice.ReadWrite)
         if success:
-            self._buffer = bytearray()
+            self._framer.clear()
             try: self.uart.clear()
             except Exception: pass
             self.port_name = name
@@ -130,29 +132,14 @@ class SerialClient(QObject):
 
     # ---- Mode direct ----
     def _on_ready(self):
-        big_reader = bytes(self.uart.readAll())
-        if not big_reader:
+        data = self.uart.readAll()
+        if data.isEmpty():
             return
-        big_reader = big_reader.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
-        if not hasattr(self, "_buffer"):
-            self._buffer = bytearray()
-        self._buffer += big_reader
-
-        while True:
-            nl = self._buffer.find(b"\n")
-            if nl < 0:
-                break
-            raw = self._buffer[:nl]
-            self._buffer = self._buffer[nl + 1:]
-
-            # Filtre strict '#pi'
-            if b"#pi" not in raw:
-                continue
-            raw = raw.replace(b"#pi", b"")
-            raw_str = raw.decode("utf-8", errors="ignore").strip()
-            if not raw_str:
-                continue
-            self._parse_and_emit(raw_str)
+        # Lignes complètes de la rafale, décodées en bloc puis classées comme en mode partagé
+        for line in self._framer.feed(data.data()):
+            kind, text, value = classify(line)
+            if kind in _PI_KINDS:
+                self._on_message(kind, text, value)
 
     # ---- Mode partagé ----
     def _on_shared_connected(self, name: str):
@@ -163,50 +150,30 @@ class SerialClient(QObject):
         self.port_name = None
         self.disconnected.emit()
 
-    def _on_shared_filtre_line(self, raw_str: str):
-        # Filtre strict '#pi'
-        if "#pi" not in raw_str:
+    def _on_messages(self, batch: list):
+        # Un lot par événement Qt (voir SerialBridge) ; d'autres fenêtres peuvent avoir souscrit d'autres types
+        for kind, text, value in batch:
+            if kind in _PI_KINDS:
+                self._on_message(kind, text, value)
+
+    # ---- Messages classés (communs aux deux modes) ----
+    def _on_message(self, kind: str, text: str, value):
+        if not text:
             return
-        raw_str = raw_str.replace("#pi", "").strip()
-        if raw_str:
-            self._parse_and_emit(raw_str)
-
-    # ---- Parsing commun ----
-    def _parse_and_emit(self, raw_str: str):
-        is_ant = False
-        m_ant = self.re_ant.match(raw_str)
-        if m_ant:
-            is_ant = True
-            try: self.antChanged.emit(int(m_ant.group(1)))
-            except ValueError: pass
-
-        m_list = self.re_list.match(raw_str)
-        if m_list:
-            nums = []
-            for tok in re.split(r"[,\s;]+", m_list.group(1).strip()):
-                if tok.isdigit():
-                    v = int(tok)
-                    if 1 <= v <= 8:
-                        nums.append(v)
+        if kind == MSG_ANT:
+            self.antChanged.emit(value)
+        elif kind == MSG_LIST:
+            nums = [v for v in value if 1 <= v <= 8]
             if nums:
                 self.listEchoed.emit(nums)
-
-        is_debug = False
-        m_dbg = self.re_debug.match(raw_str)
-        if m_dbg:
-            is_debug = True
-            try:
-                drv = int(m_dbg.group(1))
-                gpio = int(m_dbg.group(2))
-                ls = int(m_dbg.group(3))
-                code = m_dbg.group(4).upper()
-                self.debugParsed.emit(drv, gpio, ls, code)
-            except ValueError:
-                pass
+        elif kind == MSG_DEBUG:
+            self.debugParsed.emit(*value)
+        elif kind != MSG_PI:
+            return
 
         # STOP UART_RX masque ANT/DEBUG dans la console uniquement
-        if self.logging_enabled or not (is_ant or is_debug):
-            self.lineParsed.emit(raw_str)
+        if self.logging_enabled or kind not in (MSG_ANT, MSG_DEBUG):
+            self.lineParsed.emit(text)
 
 
 def _style(active: bool, outline="#9e9e9e") -> str:
@@ -2,6 +2,7 @@
 from PyQt5 import QtWidgets
 import sys
 from Domaine.controle_donnee import ControleDonnee
+from Stockage.history_csv import HistoryStoreCSV, WRITER_BACKGROUND
 from Pilotes.stm32controle_fake import STM32ControleFake
 # from stm32controle_serial import STM32ControleSerial
 from Affichage.afficheur import Afficheur
@@ -12,7 +13,9 @@ def main():
     #stm32 = STM32ControleFake()  # Remplace par STM32ControleSerial(...) pour la vraie liaison
     # stm32 = STM32ControleFake()
     stm32 = STM32ControleSerial()
-    controle = ControleDonnee(stm32)
+    store = HistoryStoreCSV("logs", writer=WRITER_BACKGROUND, archive_after_days=7, visits_merge_gap_ms=2000)
+    controle = ControleDonnee(stm32, store=store, threaded=True)  # traitement + écritures hors thread GUI
+    app.aboutToQuit.connect(controle.close)
     ui = Afficheur(controle); ui.show()
     sys.exit(app.exec_())
 